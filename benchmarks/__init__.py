@@ -0,0 +1,12 @@
+"""Benchmarks for the map pipeline
+
+Times parsing, exporting, indexing, and minimap rendering on synthetic maps
+from 10x10 up to 255x255 and compares them against a stored baseline.
+Runs offline, without Discord or Redis.
+
+    python -m benchmarks                # compare against benchmarks/baseline.json
+    python -m benchmarks --save         # store the results as the new baseline
+
+Timings depend on the machine, so save a baseline on the machine the
+comparisons will run on.
+"""
@@ -0,0 +1,179 @@
+"""Run the map pipeline benchmarks. See `python -m benchmarks --help`"""
+
+# Lib
+from argparse import ArgumentParser
+from json import dump, load
+from os.path import dirname, exists, join
+from platform import platform, python_version
+from sys import exit
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+from typing import Any, Callable, Coroutine, Dict, List, Tuple
+
+# Local
+from benchmarks.maps import SIZES, synthetic_map
+from utils.awmap import AWMap, AWMinimap
+
+
+BASELINE = join(dirname(__file__), "baseline.json")
+
+
+def complete(coro: Coroutine) -> Any:
+    """Result of a coroutine that never suspends, without an event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("Coroutine suspended")
+
+
+def stages(awmap: AWMap) -> Dict[str, Callable[[], Any]]:
+    """Stages of the pipeline to time for a map, by name
+
+    Exports and renders start from an empty cache each time, so they are
+    timed in full instead of as patches of the last run"""
+    aws = bytes(awmap.to_aws)
+    csv = awmap.to_awbw
+
+    def to_aws():
+        awmap._clear_caches()
+        return awmap.to_aws
+
+    def to_awbw():
+        awmap._clear_caches()
+        return awmap.to_awbw
+
+    def minimap():
+        awmap._clear_caches()
+        return AWMinimap(awmap).map
+
+    return {
+        "from_aws": lambda: AWMap().from_aws(aws),
+        "from_awbw": lambda: complete(AWMap().from_awbw(data=csv, title=awmap.title)),
+        "to_aws": to_aws,
+        "to_awbw": to_awbw,
+        "playable_countries": lambda: awmap.playable_countries,
+        "minimap": minimap,
+    }
+
+
+def measure(func: Callable[[], Any], min_time: float, rounds: int = 5) -> Tuple[float, int]:
+    """Time a stage
+
+    The stage is run over and over in `rounds` rounds of `min_time` /
+    `rounds` seconds each, and the fastest round is kept. Slower rounds
+    are mostly the machine being busy with something else
+
+    :param func: stage to time
+    :param min_time: seconds to keep running the stage for
+    :param rounds: rounds to split the runs into
+
+    :return: (operations per second, peak memory allocated during one run in bytes)"""
+
+    # First run loads anything done once, e.g. the minimap sprite atlas
+    func()
+
+    best = 0
+    for _ in range(rounds):
+        runs = 0
+        begin = perf_counter()
+        while True:
+            func()
+            runs += 1
+            elapsed = perf_counter() - begin
+            if elapsed >= min_time / rounds:
+                break
+        best = max(best, runs / elapsed)
+
+    # Tracing slows everything down, so memory is measured on its own run
+    start()
+    try:
+        func()
+        _, peak = get_traced_memory()
+    finally:
+        stop()
+
+    return best, peak
+
+
+def regressions(
+        results: Dict[str, Dict[str, Dict[str, float]]],
+        baseline: Dict[str, Dict[str, Dict[str, float]]],
+        tolerance: float
+) -> List[str]:
+    """Stages slower, or using more memory, than the baseline by more than `tolerance`
+
+    :return: list of descriptions of each regression"""
+    found = list()
+    for size, size_results in results.items():
+        for stage, result in size_results.items():
+            base = baseline.get(size, {}).get(stage)
+            if not base:
+                continue
+
+            if result["ops"] * (1 + tolerance) < base["ops"]:
+                found.append(f"{size} {stage}: {result['ops']:.1f} ops/s, baseline {base['ops']:.1f} ops/s")
+
+            # Allow for allocator noise on stages that barely allocate
+            if result["peak"] > base["peak"] * (1 + tolerance) + 64 * 1024:
+                found.append(f"{size} {stage}: peak {result['peak'] / 1024:.0f} KiB, "
+                             f"baseline {base['peak'] / 1024:.0f} KiB")
+    return found
+
+
+def main() -> int:
+    parser = ArgumentParser(prog="python -m benchmarks", description="Benchmark the map pipeline")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file (default: %(default)s)")
+    parser.add_argument("--save", action="store_true", help="save the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="fraction a stage may regress by before failing (default: %(default)s)")
+    parser.add_argument("--min-time", type=float, default=1,
+                        help="seconds to run each stage for (default: %(default)s)")
+    parser.add_argument("--sizes", help="comma separated sizes to run, e.g. 10x10,255x255")
+    parser.add_argument("--stages", help="comma separated stages to run, e.g. from_aws,minimap")
+    args = parser.parse_args()
+
+    sizes = SIZES
+    if args.sizes:
+        sizes = [tuple(int(n) for n in size.split("x")) for size in args.sizes.split(",")]
+    names = args.stages.split(",") if args.stages else None
+
+    results = dict()
+    print(f"{'size':>9}  {'stage':<20}{'ops/s':>10}{'peak KiB':>11}")
+    for w, h in sizes:
+        size = f"{w}x{h}"
+        results[size] = dict()
+        for stage, func in stages(synthetic_map(w, h)).items():
+            if names and stage not in names:
+                continue
+
+            ops, peak = measure(func, args.min_time)
+            results[size][stage] = {"ops": ops, "peak": peak}
+            print(f"{size:>9}  {stage:<20}{ops:>10.1f}{peak / 1024:>11.0f}")
+
+    if args.save:
+        with open(args.baseline, "w") as fp:
+            dump({"python": python_version(), "platform": platform(), "results": results}, fp, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+
+    if not exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}. Run with --save to store one")
+        return 0
+
+    with open(args.baseline) as fp:
+        baseline = load(fp)
+
+    found = regressions(results, baseline["results"], args.tolerance)
+    if found:
+        print(f"\nRegressed past the baseline by more than {args.tolerance:.0%}:")
+        for regression in found:
+            print(f"  {regression}")
+        return 1
+
+    print(f"\nNo regressions against the baseline from Python {baseline['python']} on {baseline['platform']}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
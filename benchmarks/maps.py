@@ -0,0 +1,87 @@
+"""Synthetic maps for the benchmarks
+
+Maps are generated from a seed, so every run benchmarks the same maps.
+They are laid out roughly like real ones: an island of land surrounded by
+sea, with a road and a river across it, neutral and owned properties, an
+HQ for each player, and predeployed units on land and at sea.
+"""
+
+# Lib
+from random import Random
+from typing import List, Tuple
+
+# Local
+from utils.awmap import AWMap
+
+
+# Map sizes benchmarked, (width, height). Covers each minimap sprite size
+SIZES: List[Tuple[int, int]] = [(10, 10), (30, 20), (40, 40), (50, 50), (100, 100), (255, 255)]
+
+# Land terrain weights: Plain, Wood, Mountain, Pipe
+LAND = (1, 2, 3, 10)
+LAND_WEIGHTS = (60, 18, 12, 2)
+
+# Property weights: City, Base, Airport, Tower, Lab
+PROPS = (102, 103, 104, 106, 107)
+PROPS_WEIGHTS = (70, 15, 8, 4, 3)
+
+LAND_UNITS = (1, 2, 11, 12, 13, 14, 17, 21, 22, 31, 32, 33)
+SEA_UNITS = (41, 42, 43, 44, 45)
+
+
+def synthetic_map(w: int, h: int, seed: int = 0) -> AWMap:
+    """Generate a map of `w` x `h` tiles
+
+    :param w: width in tiles
+    :param h: height in tiles
+    :param seed: seed for the layout
+
+    :return: `AWMap` of the generated map"""
+    rnd = Random(seed)
+
+    awmap = AWMap()
+    awmap.size_w, awmap.size_h = w, h
+    awmap.title, awmap.author = f"Synthetic {w}x{h}", "benchmarks"
+    awmap._init_layers()
+
+    players = list(range(1, 2 + min(w, h) // 40 + rnd.randrange(2) + 1))
+    border = max(1, min(w, h) // 10)
+    road_y = rnd.randrange(border, max(border + 1, h - border))
+    river_x = rnd.randrange(border, max(border + 1, w - border))
+
+    for y in range(h):
+        for x in range(w):
+            edge = min(x, y, w - 1 - x, h - 1 - y)
+            if edge < border - 1:
+                terr = 8 if rnd.random() < 0.03 else 6
+            elif edge == border - 1:
+                terr = 7
+            elif x == river_x:
+                terr = 5 if y == road_y else 9
+            elif y == road_y:
+                terr = 4
+            else:
+                terr = rnd.choices(LAND, LAND_WEIGHTS)[0]
+
+            t_ctry = 0
+            if terr == 1 and rnd.random() < 0.1:
+                terr = rnd.choices(PROPS, PROPS_WEIGHTS)[0]
+                if rnd.random() < 0.3:
+                    t_ctry = rnd.choice(players)
+            elif edge == border and rnd.random() < 0.05:
+                terr = 105
+
+            awmap.mod_terr(x, y, terr, t_ctry)
+
+            if terr == 6 and rnd.random() < 0.01:
+                awmap.mod_unit(x, y, rnd.choice(SEA_UNITS), rnd.choice(players))
+            elif terr in LAND and rnd.random() < 0.03:
+                awmap.mod_unit(x, y, rnd.choice(LAND_UNITS), rnd.choice(players))
+
+    # One HQ for each player, spread across the island
+    for player in players:
+        x = rnd.randrange(border, max(border + 1, w - border))
+        y = rnd.randrange(border, max(border + 1, h - border))
+        awmap.mod_terr(x, y, 101, player)
+
+    return awmap
@@ -649,7 +649,7 @@ class Admin(Cog):
         `Displays current prefix settings"""
 
         if ctx.guild:
-            guild_prefix = self.config_bot.hget("prefix:guild", ctx.guild.id)
+            guild_prefix = self.bot.prefixes.guild(ctx.guild.id)
 
             if guild_prefix:
                 guild_prefix = f"`{guild_prefix}`"
@@ -666,13 +666,13 @@ class Admin(Cog):
 
         em.add_field(
             name="Default Prefix:",
-            value=f"`{self.config_bot.hget('prefix:config', 'default_prefix')}`",
+            value=f"`{self.bot.prefixes.default_prefix}`",
             inline=False
         )
 
         em.add_field(
             name="When Mentioned:",
-            value=f"`{self.config_bot.hget('prefix:config', 'when_mentioned')}`",
+            value=f"`{self.bot.prefixes.when_mentioned}`",
             inline=False
         )
 
@@ -691,7 +691,7 @@ class Admin(Cog):
         """Show or change default prefix"""
 
         if prefix:
-            self.config_bot.hset("prefix:config", "default_prefix", prefix)
+            self.bot.prefixes.set_default(prefix)
             em = Embed(
                 title="Administration: Default Prefix",
                 description=f"Default prefix changed to `{prefix}`",
@@ -699,7 +699,7 @@ class Admin(Cog):
             )
 
         else:
-            default_prefix = self.config_bot.hget("prefix:config", "default_prefix")
+            default_prefix = self.bot.prefixes.default_prefix
             em = Embed(
                 title="Administration: Default Prefix",
                 description=f"Default prefix currently set to `{default_prefix}`",
@@ -717,9 +717,9 @@ class Admin(Cog):
         `[p]prefix mention [True|False]` to set setting"""
 
         if enabled is None:
-            enabled = not self.config_bot.hget("prefix:config", "when_mentioned")
+            enabled = not self.bot.prefixes.when_mentioned
 
-        self.config_bot.hset("prefix:config", "when_mentioned", str(enabled))
+        self.bot.prefixes.set_when_mentioned(enabled)
 
         em = Embed(
             title="Administration: Mention As Prefix",
@@ -734,7 +734,7 @@ class Admin(Cog):
     async def guild(self, ctx: Context, *, prefix: str = None):
         """Change guild-specific prefix"""
 
-        current_guild_prefix = self.config_bot.hget("prefix:guild", f"{ctx.guild.id}")
+        current_guild_prefix = self.bot.prefixes.guild(ctx.guild.id)
 
         if prefix:
             if current_guild_prefix == prefix:
@@ -746,7 +746,7 @@ class Admin(Cog):
                 )
 
             else:
-                self.config_bot.hset("prefix:guild", f"{ctx.guild.id}", prefix)
+                self.bot.prefixes.set_guild(ctx.guild.id, prefix)
                 em = Embed(
                     title="Administration: Guild-Specific Prefix",
                     description=f"Prefix for guild `{ctx.guild.name}` set to `{prefix}`",
@@ -754,7 +754,7 @@ class Admin(Cog):
                 )
 
         else:
-            self.config_bot.hdel("prefix:guild", f"{ctx.guild.id}")
+            self.bot.prefixes.set_guild(ctx.guild.id, None)
             em = Embed(
                 title="Administration: Guild-Specific Prefix",
                 description=f"Prefix for guild `{ctx.guild.name}` unset",
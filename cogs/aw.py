@@ -1,14 +1,16 @@
 """Commands for Advance Wars Maps"""
 
 # Lib
-from datetime import datetime
+from collections import Counter
+from hashlib import blake2b
 from io import BytesIO
 from os.path import splitext
 from re import compile
-from urllib.parse import quote
+from time import time
+from urllib.parse import parse_qs, quote, urlsplit
 
 # Site
-from asyncio import sleep
+from asyncio import ensure_future, gather
 from discord.channel import DMChannel
 from discord.embeds import Embed
 from discord.errors import HTTPException
@@ -23,7 +25,10 @@ from typing import Union, Optional
 # Local
 from utils.checks import sudo
 from utils.classes import Bot, SubRedis
-from utils.awmap import AWMap
+from utils.awbw_api import AWBWClient, DEFAULT_CLIENT
+from utils.awmap import AWMap, MINIMAP_CACHE
+from utils.map_service import MapService
+from utils.sessions import SessionStore
 from utils.errors import (
     AWBWDimensionsError,
     FileSaveFailureError,
@@ -31,6 +36,7 @@ from utils.errors import (
     NoLoadedMapError,
     UnimplementedError
 )
+from utils.timers import STAGE_TIMES
 
 RE_AWL = compile(r"(http[s]?://)?awbw.amarriner.com/(glenstorm/|2030/)?prevmaps.php\?maps_id=(?P<id>[0-9]+)(?i)")
 RE_CSV = compile(r"(([0-9])+(,[0-9]*)*(\n[0-9]+(,[0-9]*)*)*)")  # {1}")
@@ -39,6 +45,29 @@ VIEW_GAMES = "https://awbw.amarriner.com/gamescurrent.php?maps_id={0}"
 PLANNER = "https://awbw.amarriner.com/moveplanner.php?maps_id={0}"
 ANALYSIS = "https://awbw.amarriner.com/analysis.php?maps_id={0}"
 
+# Seconds to keep the URL of a hosted file, unless its CDN link expires first
+HOSTED_TTL = 7 * 24 * 60 * 60
+
+# Hosted URLs this close to expiring are not handed out, in seconds
+HOSTED_MARGIN = 60 * 60
+
+# Most maps `map loadall` will load from one message
+MAX_BATCH = 5
+
+# Attachment extensions `CheckMap.check` can load maps from
+MAP_EXTENSIONS = (".aws", ".txt", ".csv")
+
+# Seconds a loaded map is kept after it was last used
+SESSION_TTL = 5 * 60
+
+# Seconds a loaded map is kept in memory after it was last used. After
+# that it is read back from Redis when it is used again
+SESSION_IDLE = 60
+
+# Most maps kept loaded at once, by number and by total size in bytes
+MAX_SESSIONS = 500
+MAX_SESSION_BYTES = 128 * 1024 * 1024
+
 
 class AdvanceWars(Cog):
     """
@@ -58,7 +87,25 @@ class AdvanceWars(Cog):
 
         self.listen_for_maps = bool(self.config.get("listen_for_maps")) or False
         self.buffer_channel = self.bot.get_channel(id=434551085185630218)
-        self.loaded_maps = {}
+        self.loaded_maps = SessionStore(
+            ttl=SESSION_TTL,
+            idle=SESSION_IDLE,
+            max_sessions=MAX_SESSIONS,
+            max_bytes=MAX_SESSION_BYTES,
+            db=SubRedis(self.config, "sessions")
+        )
+
+        # URLs of files already sent to `buffer_channel`, keyed by digest
+        self.hosted_files = SubRedis(self.config, "hosted")
+
+        # Messages seen by the map listener, by the stage that turned them
+        # away, or "loaded" if a map was loaded from them
+        self.listener_stats = Counter()
+
+    def cog_unload(self):
+        """Stop expiring loaded maps when the cog is unloaded.
+        They are kept in Redis for when it is loaded again"""
+        self.loaded_maps.clear()
 
     """
         #################################
@@ -79,7 +126,7 @@ class AdvanceWars(Cog):
         See `[p]help map load` for more information
         on loading maps."""
 
-        if ctx.author.id in self.loaded_maps.keys():
+        if ctx.author.id in self.loaded_maps:
 
             # Subcommands available to ctx.author
             avail_cmds = []
@@ -144,13 +191,73 @@ class AdvanceWars(Cog):
         unloaded and must loaded again to continue
         working with them."""
 
-        awmap = await CheckMap.check(ctx.message, title, verify=True)
+        with STAGE_TIMES.time("load"):
+            awmap = await CheckMap.check(
+                ctx.message,
+                title,
+                verify=True,
+                service=self.bot.map_service,
+                client=self.bot.awbw
+            )
 
-        if not awmap:
+            if not awmap:
+                raise InvalidMapError
+
+            await self.em_load(ctx.channel, awmap)
+
+        self.store_map(ctx.author, awmap)
+
+    @_map.command(name="loadall", usage="[links]", aliases=["loadmany"])
+    async def load_all(self, ctx: Context, *, _: str = ""):
+        """Load every AWBW map linked in a message
+
+        Works the same as `[p]map load` with AWBW map
+        links, but for up to 5 links at a time. The maps
+        are all fetched and shown at the same time.
+
+        The first map linked stays loaded to be worked
+        with. See `[p]help map load` for more details."""
+
+        maps_ids = list(dict.fromkeys(int(m.group("id")) for m in RE_AWL.finditer(ctx.message.content)))
+        if not maps_ids:
             raise InvalidMapError
 
-        await self.em_load(ctx.channel, awmap)
-        await self.timed_store(ctx.author, awmap)
+        # Show each map as soon as it arrives, while the rest are still being fetched
+        loaded = dict()
+        embeds = list()
+        async for maps_id, result in self.bot.awbw.get_maps(maps_ids[:MAX_BATCH], verify=True):
+            if isinstance(result, Exception):
+                continue
+            try:
+                loaded[maps_id] = await AWMap().from_awbw(awbw_id=maps_id, client=self.bot.awbw)
+            except Exception:
+                continue
+            embeds.append(ensure_future(self.em_load(ctx.channel, loaded[maps_id])))
+
+        results = await gather(*embeds, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        if not loaded:
+            raise InvalidMapError
+
+        failed = [str(maps_id) for maps_id in maps_ids if maps_id not in loaded]
+        if failed:
+            note = f"Only {MAX_BATCH} maps can be loaded at a time.\n" if len(maps_ids) > MAX_BATCH else ""
+            em = Embed(
+                color=self._color(ctx.channel),
+                title="⚠  Woah there, buddy!",
+                description="Couldn't get my hands on all of those.\n"
+                            "\n"
+                            "```\n"
+                            f"These maps were not loaded: {', '.join(failed)}\n"
+                            f"{note}"
+                            "```"
+            )
+            await ctx.send(embed=em)
+
+        self.store_map(ctx.author, loaded.get(maps_ids[0]) or next(iter(loaded.values())))
 
     @_map.group(name="draw", invoke_without_command=False, aliases=["mod"])
     async def draw(self, ctx: Context):
@@ -170,7 +277,7 @@ class AdvanceWars(Cog):
             x, y = coord
             x, y = int(x), int(y)
             awmap.mod_terr(x, y, terr, ctry)
-        await self.timed_store(ctx.author, awmap)
+        self.store_map(ctx.author, awmap)
         await self.em_load(ctx.channel, awmap)
 
     @_map.command(name="download", usage=" ")
@@ -202,58 +309,80 @@ class AdvanceWars(Cog):
         ##########################
     """
 
-    async def timed_store(self, user: Member, awmap: AWMap) -> None:
-        """
-        Stores an AWMap by user ID with a expiry of 5 minutes.
-        Loading another map will reset the timer. Stored in
-        `self.loaded_maps` dict with structure:
-
-        user.id: {
-            "awmap": awmap,
-            "ts": datetime.utcnow()
-            }
+    def store_map(self, user: Member, awmap: AWMap) -> None:
+        """Stores an AWMap by user ID in `self.loaded_maps`,
+        replacing any map the user had loaded. The map
+        is written to Redis and expires 5 minutes after
+        it was last used
 
         :param user: `discord.Member` instance of command author
         :param awmap: `AWMap` instance of map loaded by `user`
 
-        :returns: `None` (Does not return)
+        :returns: `None`
         """
-        ts = datetime.utcnow()
-        self.loaded_maps[user.id] = {
-            "ts": ts,
-            "awmap": awmap
-        }
-        await sleep(300)
-        if self.loaded_maps[user.id]["ts"] == ts:
-            self.loaded_maps.pop(user.id)
+        self.loaded_maps.put(user.id, awmap)
 
     def get_loaded_map(self, user: Member) -> Union[AWMap, None]:
         """Will retrieve loaded map object for a given user.
+        Using the map resets the time until it expires
 
         :param user: `discord.Member` instance for user
 
         :return: `AWMap` object or `None` if no loaded map"""
 
-        store = self.loaded_maps.get(user.id)
-
-        if store:
-            return store["awmap"]
-        else:
-            return None
+        return self.loaded_maps.get(user.id)
 
-    async def get_hosted_file(self, file: File) -> str:
+    async def get_hosted_file(self, data: bytes, filename: str) -> str:
         """Sends a message to Discord containing a file to
         return the file URL hosted on Discord
 
-        :param file: `discord.File` object containing the file to host
+        Files hosted before are looked up by a digest of
+        their name and contents and are not sent again
+        while their URL is still valid
+
+        :param data: `bytes` contents of the file to host
+        :param filename: `str` name to give the file
 
         :return: `str` URL of hosted file"""
-        msg = await self.buffer_channel.send(file=file)
-        return msg.attachments[0].url
+        digest = blake2b(filename.encode("utf-8") + b"\x00" + data, digest_size=16).hexdigest()
+
+        url = self.hosted_files.get(digest)
+        if url and self.hosted_url_ttl(url) > 0:
+            return url
+
+        with STAGE_TIMES.time("upload"):
+            msg = await self.buffer_channel.send(file=File(fp=BytesIO(data), filename=filename))
+        url = msg.attachments[0].url
+
+        ttl = self.hosted_url_ttl(url)
+        if ttl > 0:
+            self.hosted_files.set(digest, url, ex=ttl)
+
+        return url
+
+    @staticmethod
+    def hosted_url_ttl(url: str) -> int:
+        """Seconds a hosted file URL can still be handed out for
+
+        Discord CDN links are signed with an expiry time,
+        the hex timestamp in their `ex` parameter. Links
+        without one are kept for `HOSTED_TTL`
+
+        :param url: `str` URL of hosted file
+
+        :return: `int` seconds, 0 or less if expired"""
+        expiry = parse_qs(urlsplit(url).query).get("ex")
+        if not expiry:
+            return HOSTED_TTL
+
+        try:
+            return min(int(int(expiry[0], 16) - time()) - HOSTED_MARGIN, HOSTED_TTL)
+        except ValueError:
+            return 0
 
     async def get_aws(self, awmap: AWMap) -> str:
-        """Uses `AWMap`'s `to_aws` parameter to export a map
-        as AWS file then returns a link to the file hosted on
+        """Uses the bot's `MapService` to export a map as
+        AWS file then returns a link to the file hosted on
         Discord using `get_hosted_file` method
 
         :param awmap: `AWMap` instance of map to export
@@ -265,17 +394,15 @@ class AdvanceWars(Cog):
         else:
             title = "Untitled"
 
-        attachment = File(
-            fp=BytesIO(awmap.to_aws),
-            filename=f"{title}.aws"
-        )
-        url = await self.get_hosted_file(attachment)
+        with STAGE_TIMES.time("export_aws"):
+            data = await self.bot.map_service.to_aws(awmap)
+        url = await self.get_hosted_file(data, f"{title}.aws")
 
         return url
 
     async def get_awbw(self, awmap: AWMap) -> str:
-        """Uses `AWMap`'s `to_awbw` parameter to export a map
-        to an AWBW CSV text file then returns a link to the file
+        """Uses the bot's `MapService` to export a map to an
+        AWBW CSV text file then returns a link to the file
         hosted on Discord using `get_hosted_file` method
 
         :param awmap: `AWMap` instance of map to export
@@ -287,19 +414,19 @@ class AdvanceWars(Cog):
         else:
             title = "Untitled"
 
-        attachment = File(
-            fp=BytesIO(awmap.to_awbw.encode("utf-8")),
-            filename=f"{title}.csv"
-        )
-        url = await self.get_hosted_file(attachment)
+        # Includes resolving the awareness of every aware tile
+        with STAGE_TIMES.time("export_awbw"):
+            data = (await self.bot.map_service.to_awbw(awmap)).encode("utf-8")
+        url = await self.get_hosted_file(data, f"{title}.csv")
 
         return url
 
     async def get_minimap(self, awmap: AWMap) -> str:
-        """Uses `AWMap`'s `minimap` parameter to generate a
-        `PIL` image of a minimap representing the loaded map
+        """Uses the bot's `MapService` to generate a `PIL`
+        image of a minimap representing the loaded map
         then returns a link to the file hosted on Discord
-        using the `get_hosted_file` method
+        using the `get_hosted_file` method. Maps that were
+        rendered before are served from `MINIMAP_CACHE`
 
         :param awmap: `AWMap` instance of map
 
@@ -310,8 +437,8 @@ class AdvanceWars(Cog):
         else:
             title = "[Untitled]"
 
-        attachment = File(fp=awmap.minimap, filename=f"{title}.gif")
-        url = await self.get_hosted_file(attachment)
+        data = (await self.bot.map_service.minimap(awmap)).getvalue()
+        url = await self.get_hosted_file(data, f"{title}.gif")
 
         return url
 
@@ -374,13 +501,19 @@ class AdvanceWars(Cog):
 
     async def em_download(self, channel, awmap: AWMap):
         """Formats and sends an embed to `channel` containing
-        downloads for the supported map types."""
+        downloads for the supported map types.
+
+        The exports are generated and uploaded concurrently.
+        A minimap already rendered or hosted by `em_load`
+        for the map as it is now is reused."""
 
         em = self.base_embed(channel, awmap)
 
-        aws = await self.get_aws(awmap)
-        csv = await self.get_awbw(awmap)
-        thumb = await self.get_minimap(awmap)
+        aws, csv, thumb = await gather(
+            self.get_aws(awmap),
+            self.get_awbw(awmap),
+            self.get_minimap(awmap)
+        )
 
         em.add_field(name="Downloads", value=f"[AWS]({aws})\n[AWBW CSV]({csv})")
         em.set_thumbnail(url=thumb)
@@ -415,6 +548,35 @@ class AdvanceWars(Cog):
                    description=f"Active Listen For Maps: `{self.listen_for_maps}`")
         await ctx.send(embed=em)
 
+    @sudo()
+    @_map.command(name="stats", hidden=True, usage="[reset]")
+    async def stats(self, ctx: Context, *, arg: str = ""):
+        """View how long each stage of working with maps takes
+
+        Administrative command that will display the
+        median, 95th and 99th percentile times of the
+        latest runs of each stage, in milliseconds.
+        Use `[p]map stats reset` to start over."""
+
+        if arg.strip(" ").lower() == "reset":
+            STAGE_TIMES.clear()
+            self.listener_stats.clear()
+
+        rows = [f"{'stage':<12}{'runs':>6}{'p50':>9}{'p95':>9}{'p99':>9}"]
+        for stage, (count, *percentiles) in STAGE_TIMES.summary().items():
+            rows.append(f"{stage:<12}{count:>6}" + "".join(f"{p * 1000:>9.1f}" for p in percentiles))
+
+        em = Embed(color=self._color(ctx.channel), title="BattleMaps Stage Times",
+                   description="```\n" + "\n".join(rows) + "\n```")
+        em.add_field(name="Minimap Cache",
+                     value=f"{len(MINIMAP_CACHE)} maps, {MINIMAP_CACHE.size // 1024} KiB\n"
+                           f"{MINIMAP_CACHE.hits} hits, {MINIMAP_CACHE.misses} misses")
+        em.add_field(name="Map Service", value=f"{self.bot.map_service.jobs} jobs running")
+        if self.listener_stats:
+            em.add_field(name="Map Listener", inline=False,
+                         value="\n".join(f"{stage}: {count}" for stage, count in self.listener_stats.most_common()))
+        await ctx.send(embed=em)
+
     @sudo()
     @_map.command(name="viewallmaps", hidden=True, aliases=["vam"])
     async def viewallmaps(self, ctx: Context):
@@ -424,7 +586,8 @@ class AdvanceWars(Cog):
         Map titles and user IDs for all currently
         loaded maps"""
         em = Embed(color=self._color(ctx.channel), title="All Currently Loaded Maps",
-                   description="\n".join(f"{k} @ {v['ts']}: {v['awmap'].title}" for k, v in self.loaded_maps.items()))
+                   description="\n".join(f"{k} @ {v.loaded}: {v.awmap.title}" for k, v in self.loaded_maps.items()))
+        em.set_footer(text=f"{len(self.loaded_maps)} maps, {self.loaded_maps.nbytes // 1024} KiB")
         await ctx.send(embed=em)
 
     # @checks.sudo()
@@ -470,22 +633,78 @@ class AdvanceWars(Cog):
 
     @Cog.listener("on_message")
     async def on_message(self, msg: Message):
-        if self.listen_for_maps and not msg.author.bot:
-            if not any([msg.content.startswith(prefix) for prefix in self.bot.command_prefix(self.bot, msg)]):
-                awmap = await CheckMap.check(msg, skips=["msg_csv", "id"])
-                if awmap:
-                    await self.em_load(msg.channel, awmap)
-                    await self.timed_store(msg.author, awmap)
+        if not self.listen_for_maps:
+            return
+
+        # Cheapest checks first. Each stage counts the messages it turns away
+        if msg.author.bot:
+            self.listener_stats["bot"] += 1
+            return
+
+        skips = ["msg_csv", "id"]
+        if not CheckMap.is_candidate(msg, skips):
+            self.listener_stats["no_candidate"] += 1
+            return
+
+        if any([msg.content.startswith(prefix) for prefix in self.bot.command_prefix(self.bot, msg)]):
+            self.listener_stats["command"] += 1
+            return
+
+        awmap = await CheckMap.check(
+            msg,
+            skips=skips,
+            service=self.bot.map_service,
+            client=self.bot.awbw
+        )
+        if not awmap:
+            self.listener_stats["no_map"] += 1
+            return
+
+        self.listener_stats["loaded"] += 1
+        await self.em_load(msg.channel, awmap)
+        self.store_map(msg.author, awmap)
 
 
 class CheckMap:
 
+    @staticmethod
+    def is_candidate(msg: Message, skips: list = None) -> bool:
+        """Quickly rule out messages `check` would find no
+        map in, without running any regular expressions
+
+        A message is a candidate if it has an attachment
+        with a map extension or mentions AWBW. Unless
+        the CSV and map ID checks are skipped, as the map
+        listener does, every message is a candidate.
+
+        :param msg: `discord.Message` to check
+        :param skips: Optional list of checks to exclude,
+        as passed to `check`
+
+        :return: `False` if `check` can't find a map in `msg`"""
+
+        if not skips:
+            skips = ""
+
+        # CSV maps and map IDs can be anywhere in a message. Only the
+        # regular expressions in `check` can rule them out
+        if "msg_csv" not in skips or "id" not in skips:
+            return True
+
+        if msg.attachments:
+            if splitext(msg.attachments[0].filename)[1].lower() in MAP_EXTENSIONS:
+                return True
+
+        return "link" not in skips and "awbw" in msg.content.lower()
+
     @staticmethod
     async def check(
             msg: Message,
             title: str = "[Untitled]",
             skips: list = None,
-            verify: bool = True
+            verify: bool = True,
+            service: MapService = None,
+            client: AWBWClient = None
     ) -> Optional[AWMap]:
         """Takes a discord.Message object and checks
         for valid maps that can be loaded.
@@ -494,6 +713,10 @@ class CheckMap:
         :param title: Optional title for text maps
         :param skips: Optional list of checks to exclude
         :param verify: `bool` Use SSL to request AWBW map
+        :param service: Optional `MapService` to parse maps
+        in. Maps are parsed in place without one
+        :param client: Optional `AWBWClient` to request AWBW
+        maps with
 
         :return: `AWMap` instance of valid map is found
         :return: `None` if no valid map is found"""
@@ -506,19 +729,24 @@ class CheckMap:
             filename, ext = splitext(attachment.filename)
 
             if "aws" not in skips and ext == ".aws":
-                return await CheckMap.from_aws(attachment)
+                return await CheckMap.from_aws(attachment, service)
 
             if "text" not in skips and ext.lower() in [".txt", ".csv"]:
                 return await CheckMap.from_text(
                     attachment,
                     filename,
-                    msg.author.mention
+                    msg.author.mention,
+                    service
                 )
 
-        s_awl = RE_AWL.search(msg.content)
+        if "link" not in skips:
+            s_awl = RE_AWL.search(msg.content)
+
+            if s_awl:
+                return await CheckMap.from_id(s_awl.group("id"), client=client)
 
-        if "link" not in skips and s_awl:
-            return await CheckMap.from_id(s_awl.group("id"))
+        if "msg_csv" in skips and "id" in skips:
+            return
 
         s_csv = RE_CSV.search(msg.content)
 
@@ -529,37 +757,46 @@ class CheckMap:
                 return await CheckMap.from_csv(
                     s_csv.group(0),
                     title,
-                    msg.author.mention
+                    msg.author.mention,
+                    service
                 )
 
             if "id" not in skips:
-                return await CheckMap.from_id(s_csv.group(0), verify)
+                return await CheckMap.from_id(s_csv.group(0), verify, client)
 
         return
 
     @staticmethod
-    async def from_aws(attachment: Attachment) -> Union[AWMap, None]:
+    async def from_aws(attachment: Attachment, service: MapService = None) -> Union[AWMap, None]:
         """Take an attachment with an 'AWS' extension
         and return an `AWMap` instance of the map data
 
         :param attachment: The `discord.Attachment`
         instance representing the attachment
+        :param service: Optional `MapService` to parse in
 
         :return: `AWMap` instance with converted map data"""
 
         aws_bytes = BytesIO()
 
         try:
-            await attachment.save(fp=aws_bytes)
-            aws_bytes.seek(0)
-            awmap = AWMap().from_aws(aws_bytes.read())
+            with STAGE_TIMES.time("download"):
+                await attachment.save(fp=aws_bytes)
         except HTTPException:
             raise FileSaveFailureError
-        else:
-            return awmap
+
+        with STAGE_TIMES.time("parse"):
+            if service:
+                return await service.load_aws(aws_bytes.getvalue())
+            return AWMap().from_aws(aws_bytes.getvalue())
 
     @staticmethod
-    async def from_text(attachment: Attachment, filename: str, author: str) -> Union[AWMap, None]:
+    async def from_text(
+            attachment: Attachment,
+            filename: str,
+            author: str,
+            service: MapService = None
+    ) -> Union[AWMap, None]:
         """Format an `AWMap` from a message attachment
         with "CSV" extension containing AWBW map
         data
@@ -568,6 +805,7 @@ class CheckMap:
         :param filename: Name portion of file name that
         will be used as Map title
         :param author: Map author name as a Discord mention
+        :param service: Optional `MapService` to parse in
 
         :raises AWBWDimensionsError: if rows have differing
         number of columns
@@ -575,12 +813,17 @@ class CheckMap:
         :return: `AWMap` instance with map data"""
 
         awbw_bytes = BytesIO()
-        await attachment.save(fp=awbw_bytes)
+        with STAGE_TIMES.time("download"):
+            await attachment.save(fp=awbw_bytes)
         awbw_bytes.seek(0)
         map_csv = awbw_bytes.read().decode("utf-8")
 
         try:
-            awmap = await AWMap().from_awbw(map_csv, title=filename)
+            with STAGE_TIMES.time("parse"):
+                if service:
+                    awmap = await service.load_csv(map_csv, title=filename)
+                else:
+                    awmap = await AWMap().from_awbw(map_csv, title=filename)
             awmap.author = author
         except AssertionError:
             raise AWBWDimensionsError
@@ -588,40 +831,56 @@ class CheckMap:
             return awmap
 
     @staticmethod
-    async def from_id(awbw_id: str, verify: bool = True) -> Union[AWMap, None]:
+    async def from_id(awbw_id: str, verify: bool = True, client: AWBWClient = None) -> Union[AWMap, None]:
         """Use `AWMap`'s `from_awbw` method to collect
         a map from AWBW using it's map ID
 
         :param awbw_id: ID of map on AWBW
         :param verify: `bool` Use SSL to request map from AWBW
+        :param client: Optional `AWBWClient` to request with
 
         :raises InvalidMapError: if a Map with ID `awbw_id`
         is not found
 
         :return: `AWMap` instance with collected map data"""
+        client = client or DEFAULT_CLIENT
         try:
-            int(awbw_id)
-            awmap = await AWMap().from_awbw(awbw_id=int(awbw_id), verify=verify)
+            with STAGE_TIMES.time("fetch"):
+                await client.get_map(int(awbw_id), verify)
+
+            # The map info is cached by the client now
+            with STAGE_TIMES.time("parse"):
+                awmap = await AWMap().from_awbw(awbw_id=int(awbw_id), verify=verify, client=client)
         except Exception:
             raise InvalidMapError
         else:
             return awmap
 
     @staticmethod
-    async def from_csv(msg_csv: str, title: str, author: str) -> Union[AWMap, None]:
+    async def from_csv(
+            msg_csv: str,
+            title: str,
+            author: str,
+            service: MapService = None
+    ) -> Union[AWMap, None]:
         """Format an `AWMap` from a message containing raw
         AWBW CSV text
 
         :param msg_csv: CSV text of AWBW map data
         :param title: Map title
         :param author: Map author name as a Discord mention
+        :param service: Optional `MapService` to parse in
 
         :raises AWBWDimensionsError: if rows have differing
         number of columns
 
         :return: `AWMap` instance with map data"""
         try:
-            awmap = await AWMap().from_awbw(data=msg_csv, title=title)
+            with STAGE_TIMES.time("parse"):
+                if service:
+                    awmap = await service.load_csv(msg_csv, title=title)
+                else:
+                    awmap = await AWMap().from_awbw(data=msg_csv, title=title)
             awmap.author = author
         except AssertionError:
             raise AWBWDimensionsError
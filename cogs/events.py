@@ -22,7 +22,15 @@ from typing import Union
 
 # Local
 from utils.classes import Bot, Embed, SubRedis
-from utils.errors import CommandError, AWBWDimensionsError, InvalidMapError, NoLoadedMapError, UnimplementedError
+from utils.errors import (
+    CommandError,
+    AWBWDimensionsError,
+    InvalidMapError,
+    MapServiceBusyError,
+    MapServiceTimeoutError,
+    NoLoadedMapError,
+    UnimplementedError
+)
 
 
 WELCOME = "**Welcome to AWBW Discord Server {}!**\nPresent yourself and have fun!"
@@ -188,6 +196,34 @@ class Events(Cog):
             )
             await ctx.send(embed=em)
 
+        elif isinstance(error, MapServiceBusyError):
+            em = Embed(
+                color=ctx.guild.me.colour,
+                title="⚠  Woah there, buddy!",
+                description="Shop's packed right now. Got maps stacked\n"
+                            "to the rafters. Come back in a minute.\n"
+                            "\n"
+                            "```\n"
+                            "Too many maps are being worked on right now.\n"
+                            "Please try again in a moment.\n"
+                            "```"
+            )
+            await ctx.send(embed=em)
+
+        elif isinstance(error, MapServiceTimeoutError):
+            em = Embed(
+                color=ctx.guild.me.colour,
+                title="⚠  Woah there, buddy!",
+                description="That one's takin' me all day. I ain't got\n"
+                            "time to finish it. Try me again later.\n"
+                            "\n"
+                            "```\n"
+                            "Working on your map took too long and was\n"
+                            "stopped. Please try again later.\n"
+                            "```"
+            )
+            await ctx.send(embed=em)
+
         elif isinstance(error, CommandInvokeError):
             await self.errorlog.send(error.original, ctx)
 
@@ -29,12 +29,22 @@ Minimum Redis Schema
         :key description:       str         # Description will be used for Help
         :key dm_help:           bool        # If Help output will be forced to DMs
         :key errorlog:          int         # Channel ID for errorlog channel
+        :key map_workers:       int         # Optional. Map worker processes, default number of CPUs
+        :key map_jobs:          int         # Optional. Map jobs accepted at once, default 8
+        :key map_timeout:       float       # Optional. Seconds to wait for a map job, default 30
+        :key awbw_api:          str         # Optional. URL of the AWBW Maps API, e.g. a local stand-in
+        :key awbw_ttl:          int         # Optional. Seconds to cache AWBW map info, default 3600
+        :key awbw_requests:     int         # Optional. Requests to the AWBW Maps API at once, default 4
+        :key awbw_rate:         float       # Optional. Requests to the AWBW Maps API per second, default 5
     :HASH {APP_NAME}:config:run
         :key bot:               bool        # If bot account
         :key token:             str         # Login token
     :HASH {APP_NAME}:config:prefix:config
         :key default_prefix:    str         # Default bot prefix
         :key when_mentioned:    bool        # Whether bot mentions count as prefix
+    :HASH {APP_NAME}:config:prefix:guild
+        :key {guild ID}:        str         # Optional. Guild-specific prefix
+    :CHANNEL {APP_NAME}:config:prefix:invalidate   # Published to when prefixes change
 
 
 Redis Configuration JSON Schema
@@ -60,40 +70,33 @@ except FileNotFoundError:
     raise FileNotFoundError("redis.json not found in running directory")
 
 
+# Redis only connects on the first command, so this is safe to import, e.g.
+# from the map worker processes. See `MP_CONTEXT` in utils/map_service.py
 config = SubRedis(db, "config")
 
 
-if not config.hget("prefix:config", "default_prefix"):
-    config.hset("prefix:config", "default_prefix", "!")
-
-
-if not config.hget("prefix:config", "when_mentioned"):
-    config.hset("prefix:config", "when_mentioned", "False")
-
-
 def command_prefix(client: Bot, msg: Message) -> List[str]:
-    """Callable to determine guild-specific prefix or default"""
+    """Callable to determine guild-specific prefix or default
+
+    Settings are read from `client.prefixes`, which keeps them in
+    memory instead of reading them from Redis for every message"""
 
     # Get default prefix and whether mentions count
-    prefix_config = config.hgetall("prefix:config")
+    prefixes = client.prefixes
 
-    prefix = [prefix_config["default_prefix"]]
-    if prefix_config["when_mentioned"]:
+    prefix = [prefixes.default_prefix]
+    if prefixes.when_mentioned:
         prefix.extend(when_mentioned(client, msg))
 
     # If in a guild, check for guild-specific prefix
     if isinstance(msg.channel, TextChannel):
-        guild_prefix = config.hget("prefix:guild", msg.channel.guild.id)
+        guild_prefix = prefixes.guild(msg.channel.guild.id)
         if guild_prefix:
             prefix.append(guild_prefix)
 
     return prefix
 
 
-bot = Bot(db=db, app_name=APP_NAME, command_prefix=command_prefix, **config.hgetall("instance"))
-
-
-@bot.event
 async def on_ready():
     """Coroutine called when bot is logged in and ready to receive commands"""
 
@@ -120,7 +123,7 @@ async def on_ready():
             print(f"| Failed to load extension {cog}\n|   {type(e).__name__}: {e}")
 
     # "Ready" status message
-    ready = f"{config.hget('prefix:config', 'default_prefix')}help for help"
+    ready = f"{bot.prefixes.default_prefix}help for help"
     await bot.change_presence(activity=Activity(name=ready, type=2))
 
     # Pretty printing ready message and general stats
@@ -136,10 +139,24 @@ async def on_ready():
           f"# ------------------------------#")
 
 
-@bot.event
 async def on_message(msg: Message):
     await bot.process_commands(msg)
 
 
+# The map worker processes import this module again, so the bot is only
+# set up when it is run
 if __name__ == "__main__":
+    if not config.hget("prefix:config", "default_prefix"):
+        config.hset("prefix:config", "default_prefix", "!")
+
+    if not config.hget("prefix:config", "when_mentioned"):
+        config.hset("prefix:config", "when_mentioned", "False")
+
+    bot = Bot(db=db, app_name=APP_NAME, command_prefix=command_prefix, **config.hgetall("instance"))
+    bot.event(on_ready)
+    bot.event(on_message)
+
+    # Pick up prefix changes made by other processes running the bot
+    bot.prefixes.listen()
+
     bot.run(**config.hgetall("run"))
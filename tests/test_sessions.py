@@ -0,0 +1,48 @@
+"""Tests for the loaded map sessions kept in Redis"""
+
+# Lib
+from unittest import TestCase, main
+
+# Local
+from benchmarks.maps import synthetic_map
+from utils.sessions import dump_map, load_map
+from utils.tools import bool_transform
+
+
+def hgetall(fields: dict) -> dict:
+    """`fields` as read back by the bot's `StrictRedis`, which stores
+    values as strings and turns "True" and "False" into bools"""
+    return bool_transform({k: str(v) for k, v in fields.items()})
+
+
+class TestDumpMap(TestCase):
+
+    def test_round_trip(self):
+        awmap = synthetic_map(30, 20)
+        awmap.awbw_id = "12345"
+        awmap.override_awareness = False
+
+        loaded = load_map(hgetall(dump_map(awmap)))
+
+        self.assertEqual(loaded.digest, awmap.digest)
+        self.assertEqual(loaded.awareness_layer, awmap.awareness_layer)
+        self.assertEqual(loaded.awbw_id, "12345")
+        self.assertFalse(loaded.override_awareness)
+        self.assertEqual(loaded.to_aws, awmap.to_aws)
+
+    def test_bool_like_metadata(self):
+        awmap = synthetic_map(10, 10)
+        awmap.title, awmap.author, awmap.desc = "True", "False", "True"
+
+        loaded = load_map(hgetall(dump_map(awmap)))
+
+        self.assertEqual((loaded.title, loaded.author, loaded.desc), ("True", "False", "True"))
+        self.assertEqual(loaded.to_aws, awmap.to_aws)
+
+    def test_not_a_map(self):
+        with self.assertRaises(ValueError):
+            load_map({"title": "True"})
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 
+# Lib
+from asyncio import Future, Semaphore, as_completed, ensure_future, shield, sleep
+from collections import OrderedDict
+from json import loads
+from time import monotonic
+
 # Site
-from aiohttp.client import ClientSession  # TODO
+from aiohttp.client import ClientSession, ClientTimeout
 from datetime import datetime
-from requests import get
-from typing import Any, Dict  # , List, Union
+from typing import Any, AsyncGenerator, Dict, Iterable, Optional, Tuple, Union  # , List
 
 
 MAPS_API = "https://awbw.amarriner.com/matsuzen/api/map/map_info.php"
@@ -12,8 +17,188 @@ GAMES_API = "TBD"
 USER_API = "TBD"
 
 
+class AWBWClient:
+    """Client for the AWBW Maps API
+
+    Every request goes through one pooled `ClientSession`. Parsed map info
+    is cached for `ttl` seconds in memory, and in Redis if a db is given, so
+    it outlives restarts. Concurrent requests for the same map share a
+    single fetch. Requests to the API are limited to `max_requests` at a
+    time, started at most `rate` per second"""
+
+    def __init__(
+            self,
+            api: str = MAPS_API,
+            unsecured_api: str = UNSECURED_MAPS_API,
+            ttl: int = 60 * 60,
+            max_maps: int = 256,
+            timeout: float = 30,
+            max_requests: int = 4,
+            rate: float = 5,
+            db: Any = None
+    ) -> None:
+        """
+        :param api: URL of the Maps API, used when requests are verified
+        :param unsecured_api: URL of the Maps API over plain HTTP
+        :param ttl: Seconds to cache map info for
+        :param max_maps: Number of maps to cache in memory
+        :param timeout: Seconds to wait for a request
+        :param max_requests: Number of requests to the API at once
+        :param rate: Requests to the API started per second
+        :param db: Optional `SubRedis` to also cache the API responses in
+        """
+        self.api = api
+        self.unsecured_api = unsecured_api
+        self.ttl = ttl
+        self.max_maps = max_maps
+        self.timeout = timeout
+        self.max_requests = max_requests
+        self.rate = rate
+        self.db = db
+
+        # Created on first use, from inside the event loop
+        self.session: Optional[ClientSession] = None
+        self._requests: Optional[Semaphore] = None
+
+        # Time the next request to the API may start, from `monotonic`
+        self._next_request: float = 0
+
+        # Parsed map info and when it expires by maps_id, least recently used first
+        self._maps: OrderedDict[int, Tuple[float, Dict[str, Any]]] = OrderedDict()
+
+        # Fetches in flight by maps_id
+        self._fetches: Dict[int, Future] = dict()
+
+    async def get_map(self, maps_id: int = None, verify: bool = False) -> Dict[str, Any]:
+        """Requests map info from AWBW Maps API
+
+        Map info is shared between calls and must not be modified.
+        See `get_map` for the format
+
+        :param maps_id: ID of map on AWBW
+        :param verify: `bool` Use SSL to request map
+
+        :raises ValueError: if `maps_id` is not valid or no map matches it
+        :raises ConnectionError: if AWBW does not answer the request
+
+        :return: `dict` of map info"""
+
+        if not maps_id:
+            raise ValueError("No valid map ID given.")
+
+        try:
+            maps_id = int(maps_id)
+        except ValueError:
+            raise ValueError("Argument supplied not a valid map ID")
+        except TypeError:
+            raise ValueError("Argument supplied not a valid map ID")
+
+        cached = self._maps.get(maps_id)
+        if cached and cached[0] > monotonic():
+            self._maps.move_to_end(maps_id)
+            return cached[1]
+
+        fetch = self._fetches.get(maps_id)
+        if fetch is None:
+            fetch = ensure_future(self._fetch(maps_id, verify))
+            self._fetches[maps_id] = fetch
+            fetch.add_done_callback(lambda _: self._fetches.pop(maps_id, None))
+
+        # A caller giving up must not cancel the fetch for the others
+        return await shield(fetch)
+
+    async def _fetch(self, maps_id: int, verify: bool) -> Dict[str, Any]:
+        """Map info from Redis, or from the API if not cached there"""
+
+        response = self.db.get(str(maps_id)) if self.db is not None else None
+
+        if response is None:
+            if self.session is None or self.session.closed:
+                self.session = ClientSession(timeout=ClientTimeout(total=self.timeout))
+            if self._requests is None:
+                self._requests = Semaphore(self.max_requests)
+
+            api = self.api if verify else self.unsecured_api
+            async with self._requests:
+
+                # Space requests out to `rate` per second
+                now = monotonic()
+                start = max(now, self._next_request)
+                self._next_request = start + 1 / self.rate
+                await sleep(start - now)
+
+                async with self.session.get(api, params={"maps_id": maps_id}) as r_map:
+                    if r_map.status != 200:
+                        raise ConnectionError(f"Unable to establish connection to AWBW. Error: {r_map.status}")
+                    response = await r_map.text()
+
+            j_map = loads(response)
+            if j_map.get("err", False):
+                raise ValueError(j_map.get("message", "No map matches given ID."))
+
+            # Only cache responses that parse, so a bad one is fetched again next time
+            map_data = parse_map_info(maps_id, j_map)
+
+            if self.db is not None:
+                self.db.set(str(maps_id), response, ex=self.ttl)
+
+        else:
+            map_data = parse_map_info(maps_id, loads(response))
+
+        self._maps[maps_id] = (monotonic() + self.ttl, map_data)
+        while len(self._maps) > self.max_maps:
+            self._maps.popitem(last=False)
+
+        return map_data
+
+    async def get_maps(
+            self,
+            maps_ids: Iterable[int],
+            verify: bool = False
+    ) -> AsyncGenerator[Tuple[int, Union[Dict[str, Any], Exception]], None]:
+        """Requests info for many maps from AWBW Maps API at once
+
+        Maps are fetched concurrently, within the client's limits,
+        and yielded in the order they finish. Repeated IDs are only
+        fetched once. A map that fails to fetch yields the exception
+        it raised instead of stopping the rest
+
+        :param maps_ids: IDs of maps on AWBW
+        :param verify: `bool` Use SSL to request maps
+
+        :return: async generator of (maps_id, map info or exception)"""
+
+        async def fetch(maps_id: int) -> Tuple[int, Union[Dict[str, Any], Exception]]:
+            try:
+                return maps_id, await self.get_map(maps_id, verify)
+            except Exception as error:
+                return maps_id, error
+
+        fetches = [ensure_future(fetch(maps_id)) for maps_id in dict.fromkeys(maps_ids)]
+        try:
+            for result in as_completed(fetches):
+                yield await result
+        finally:
+            # Stop waiting on the rest if the caller stops early
+            for result in fetches:
+                result.cancel()
+
+    def clear(self) -> None:
+        """Drop the map info cached in memory"""
+        self._maps.clear()
+
+    async def close(self) -> None:
+        """Close the pooled session"""
+        if self.session:
+            await self.session.close()
+
+
+# Client for `get_map`, used when one isn't passed around
+DEFAULT_CLIENT = AWBWClient()
+
+
 async def get_map(maps_id: int = None, verify: bool = False) -> Dict[str, Any]:
-    """Requests map info from AWBW Maps API
+    """Requests map info from AWBW Maps API with `DEFAULT_CLIENT`
 
     Map data returned in following format:
     {
@@ -39,35 +224,21 @@ async def get_map(maps_id: int = None, verify: bool = False) -> Dict[str, Any]:
         ]
     }
     """
+    return await DEFAULT_CLIENT.get_map(maps_id, verify)
 
-    if not maps_id:
-        raise ValueError("No valid map ID given.")
-
-    try:
-        int(maps_id)
-    except ValueError:
-        raise ValueError("Argument supplied not a valid map ID")
-    except TypeError:
-        raise ValueError("Argument supplied not a valid map ID")
-
-    payload = {"maps_id": maps_id}
-
-    if verify:
-        r_map = get(MAPS_API, params=payload)
-    else:
-        r_map = get(UNSECURED_MAPS_API, params=payload, verify=False)
 
-    api = MAPS_API if verify else UNSECURED_MAPS_API
+def get_maps(
+        maps_ids: Iterable[int],
+        verify: bool = False
+) -> AsyncGenerator[Tuple[int, Union[Dict[str, Any], Exception]], None]:
+    """Requests info for many maps from AWBW Maps API at
+    once with `DEFAULT_CLIENT`. See `AWBWClient.get_maps`"""
+    return DEFAULT_CLIENT.get_maps(maps_ids, verify)
 
-    async with ClientSession() as session:
-        async with session.get(api, params=payload) as response:
-            if not response.status:
-                raise ConnectionError(f"Unable to establish connection to AWBW. Error: {r_map.status_code}")
-            else:
-                j_map = await response.json()
 
-    if j_map.get("err", False):
-        raise ValueError(j_map.get("message", "No map matches given ID."))
+def parse_map_info(maps_id: int, j_map: Dict[str, Any]) -> Dict[str, Any]:
+    """Map info in the format returned by `get_map` from
+    the JSON response of the AWBW Maps API"""
 
     map_data = dict()
 
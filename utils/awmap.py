@@ -3,36 +3,50 @@ from __future__ import annotations
 
 
 # Lib
+from array import array
+from collections import OrderedDict
 from csv import reader
+from hashlib import blake2b
 from io import BytesIO
-from math import cos, sin, pi, trunc
+from itertools import repeat
+from operator import add, mul
+from re import compile
+from sys import byteorder
+from time import perf_counter
 
 # Site
 # from PIL import Image
-from PIL.Image import Resampling, Image, new
+from PIL.Image import Image, frombytes, new
 from PIL.ImageDraw import Draw
-from typing import Dict, Generator, List, Optional, Set, Tuple, Union
+from typing import Any, BinaryIO, Dict, Generator, Iterable, List, Optional, Set, Tuple, Union
 
 # Local
-from utils.awbw_api import get_map
-from utils.tools import bytespop
+from utils.awbw_api import AWBWClient, get_map
+from utils.tools import bytespop, join_words, translate_words
 from utils.data import (
     MAIN_TERR,
     MAIN_UNIT,
     MAIN_CTRY,
     MAIN_TERR_CAT,
 
-    AWBW_TERR,
     AWBW_UNIT_CODE,
     AWBW_COUNTRY_CODE,
     AWBW_AWARENESS,
+    AWBW_AWARE_TERR,
+    AWBW_AWARE_OF_BITS,
+    AWBW_AWARE_VARIANTS,
+    AWBW_TERR_DECODE,
+    AWBW_TERR_DECODE_DEFAULT,
 
-    AWS_TERR,
-    AWS_UNIT,
+    AWS_TERR_DECODE,
+    AWS_UNIT_DECODE,
 
     main_terr_to_awbw,
     main_terr_to_aws,
     main_unit_to_aws,
+    main_terr_to_awbw_layer,
+    main_terr_to_aws_layer,
+    main_unit_to_aws_layer,
 
     BITMAP_SPEC,
     STATIC_ID_TO_SPEC,
@@ -41,6 +55,27 @@ from utils.data import (
 )
 
 
+# Offsets of the neighbours checked for AWBW awareness, by mask bit: West, South, East, North
+NEIGHBOURS: Tuple[Tuple[int, int], ...] = ((-1, 0), (0, 1), (1, 0), (0, -1))
+
+# Internal Terrain IDs of HQs and Labs, and of properties that produce units (Base, Airport, Port)
+HQ_TERR: Tuple[int, ...] = (101, 107)
+PROD_TERR: Tuple[int, ...] = (103, 104, 105)
+
+# Finds the index of every tile with a country in a layer
+RE_NONZERO = compile(rb"[^\x00]")
+
+# Translation table marking the opaque pixels of minimap sprites, which are
+# every palette index except 0 (transparent)
+OPAQUE = bytes((0, *repeat(255, 255)))
+
+# Length of one frame of a minimap animation, in milliseconds
+FRAME_DURATION = 150
+
+# Sizes in pixels minimap sprites are drawn at
+SPRITE_SIZES = (4, 8, 16)
+
+
 # def main_unit_to_awbw(unit: int = 1, ctry: int = 1) -> list:
 #     pass
 
@@ -58,13 +93,18 @@ class AWMap:
         # raw_data and can later be referenced
         self.raw_data: bytearray = bytearray()
 
-        # The actual 2D dictionary containing the AWTiles with terrain and unit
-        # data. Stored as a list of rows ([y][x]) which can be pretty printed
-        # so that the string representation will be the same orientation as the
-        # map. Keys are the index (coordinate values). Dictionaries used to
-        # avoid potential mistakes of indices. Retrieving AWTile at a given
-        # coordinate is abstracted out to self.tile(x, y)
-        self.map: Dict = dict()
+        # Terrain and unit data is stored as parallel typed arrays, one per
+        # layer, flattened as a list of rows (index = y * size_w + x) so that
+        # it is the same orientation as the map. A 255x255 map takes a few
+        # hundred KB this way instead of one Python object per tile. AWTiles
+        # are lightweight views into these layers created on demand.
+        # Retrieving AWTile at a given coordinate is abstracted out to
+        # self.tile(x, y)
+        self.terr_layer: array = array("H")
+        self.t_ctry_layer: array = array("B")
+        self.unit_layer: array = array("B")
+        self.u_ctry_layer: array = array("B")
+        self.awareness_layer: array = array("B")
 
         # Map dimensions, Width and Height
         self.size_w: int = 0
@@ -97,10 +137,37 @@ class AWMap:
         self.custom_countries: list = list()
         self.country_conversion: dict = dict()
 
+        # The AWS and AWBW exports and the minimap frames are cached once
+        # generated. Each cache has a set of tile indexes that changed since
+        # it was last brought up to date, so the next export only patches
+        # those tiles. Every write to the layers goes through self._write to
+        # keep these sets current
+        self._dirty: Dict[str, Set[int]] = dict()
+        self._aws_cache: Optional[bytearray] = None
+        self._awbw_cache: Optional[Tuple[bool, List[Union[str, int]], List[str], str]] = None
+        self._minimap_cache: Optional["MinimapFrames"] = None
+        self._digest: Optional[bytes] = None
+
+        # Number of writes to the layers, to tell if the map changed while
+        # it was away being exported by a `MapService` worker
+        self.version: int = 0
+
+        # Indexes of the tiles owned by each country, kept up to date by
+        # self._write. Properties are split into "hq", "prod" and "other"
+        self._ctry_props: Dict[int, Dict[str, Set[int]]] = dict()
+        self._ctry_units: Dict[int, Set[int]] = dict()
+
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__}:" \
                f"Title='{self.title}' Author='{self.author}>'"
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # Cached exports are left out when pickled, e.g. to be sent to a
+        # `MapService` worker. They are rebuilt on the next export
+        state = self.__dict__.copy()
+        state.update(_dirty=dict(), _aws_cache=None, _awbw_cache=None, _minimap_cache=None)
+        return state
+
     def __str__(self) -> str:
         ret = ""
         if self.title:
@@ -118,7 +185,7 @@ class AWMap:
         """
         for y in range(self.size_h):
             for x in range(self.size_w):
-                yield self.tile(x, y)
+                yield AWTile(self, x, y)
 
     """ ########################
         # Opening File Methods #
@@ -133,44 +200,23 @@ class AWMap:
         # Width, Height, and graphic style
         self.size_w, self.size_h, self.style = self.raw_data[10:13]
 
-        # Chop out the terrain data as bytes and convert to a list of ints
-        # Terrain data is stored as 2-byte IDs in sequence as a series of columns
-        terr_data = [
-            int.from_bytes(
-                self.raw_data[x + 13:x + 15],
-                'little'
-            ) for x in range(0, self.map_size * 2, 2)
-        ]
-
-        # Chop out the unit data as bytes and convert to a list of ints
-        # Same as terrain data, and every tile will have unit data
-        # Tiles with no unit will be 0xFF (65535)
-        unit_data = [
-            int.from_bytes(
-                self.raw_data[x + (self.map_size*2) + 13:x + (self.map_size*2) + 15],
-                'little'
-            ) for x in range(0, self.map_size * 2, 2)
-        ]
-
-        # Create the 2D dictionary of AWTiles by iterating over the terrain and unit data
-        map_data = {  # TODO: Refactor whole process to chunk map and unit data into 2D list and transpose first
-            x: {
-                y: AWTile(
-                    self, x, y,
-                    **self._terr_from_aws(x, y, terr_data),
-                    **self._unit_from_aws(x, y, unit_data),
-                ) for y in range(self.size_h)
-            } for x in range(self.size_w)
-        }
+        # Decode the terrain and unit data into flat lists of rows of 1-byte codes
+        # Every tile will have unit data. Tiles with no unit will be 0xFFFF (65535)
+        terr_codes = self._layer_from_aws(0, AWS_TERR_DECODE[0])
+        unit_codes = self._layer_from_aws(1, AWS_UNIT_DECODE[0])
 
-        # AWS files store terrain data as a list of columns ([x][y]) instead of a list of rows ([y][x])
-        # Transpose it before storing
-        self.map = {
-            y: {
-                x: map_data[x][y]
-                for x in range(self.size_w)
-            } for y in range(self.size_h)
-        }
+        # Translate the codes into the Internal ID and Country ID layers
+        _, lo, hi, ctry = AWS_TERR_DECODE
+        self.terr_layer = join_words(terr_codes.translate(lo), terr_codes.translate(hi))
+        self.t_ctry_layer = array("B", terr_codes.translate(ctry))
+
+        _, lo, _, ctry = AWS_UNIT_DECODE
+        self.unit_layer = array("B", unit_codes.translate(lo))
+        self.u_ctry_layer = array("B", unit_codes.translate(ctry))
+
+        self.awareness_layer = array("B", bytes(self.map_size))
+        self._clear_caches()
+        self._build_indexes()
 
         # The rest of the AWS data is metadata
         metadata = self.raw_data[13 + (self.map_size * 4):]
@@ -195,7 +241,8 @@ class AWMap:
             data: str = "",
             title: str = "",
             awbw_id: int = None,
-            verify: bool = True
+            verify: bool = True,
+            client: AWBWClient = None
     ) -> Union[AWMap, None]:
         """Loads a map from AWBW data
 
@@ -209,13 +256,17 @@ class AWMap:
                         If from AWBW site
         :param awbw_id: MAPS_ID of map on AWBW
         :param verify: `bool` Use SSL to request maps
+        :param client: Optional `AWBWClient` to request maps with
 
         :return: AWMap instance for generated map or None
         """
         if awbw_id:
 
             # Use AWBW Maps API to get map info JSON
-            awbw_map = await get_map(maps_id=awbw_id, verify=verify)
+            if client:
+                awbw_map = await client.get_map(maps_id=awbw_id, verify=verify)
+            else:
+                awbw_map = await get_map(maps_id=awbw_id, verify=verify)
 
             # Create the AWMap terrain map from the JSON terrain data
             self._parse_awbw_csv(csvdata=awbw_map["terr"])
@@ -237,9 +288,8 @@ class AWMap:
 
         elif data:
 
-            # Since the map is a CSV, parse into 2D array
-            csv_map = [*reader(data.strip('\n').split('\n'))]
-            self._parse_awbw_csv(csvdata=csv_map)
+            # Create the AWMap terrain map straight from the CSV text
+            self._parse_awbw_csv(csvdata=data)
 
             # CSVs by virtue don't have a title set, so use provided
             # title or none at all
@@ -249,80 +299,75 @@ class AWMap:
 
         return
 
-    def _parse_awbw_csv(self, csvdata: List[List[int]]) -> None:
+    def _parse_awbw_csv(self, csvdata: Union[str, Iterable[Iterable[Union[str, int]]]]) -> None:
         """Loads an AWMap with terrain from an AWBW CSV
 
-        This creates a map of AWTile objects in the `self.map` attribute
+        This fills the terrain layers of the map in one pass over the rows.
+        Rows are checked to all be the same length as they are read
 
-        :param csvdata: 2D list of int awbw terrain IDs
+        :param csvdata: multiline string CSV of AWBW terrain IDs, or
+                        2D list of AWBW terrain IDs as from `get_map`
+        :raises AssertionError: if rows have differing numbers of columns,
+                                or there are no rows
         :return: None"""
 
-        # Make sure all rows passed are equal length
-        # Calling method will need to catch AssertionError
-        assert all(map(lambda r: len(r) == len(csvdata[0]), csvdata))
+        if isinstance(csvdata, str):
+            csvdata = reader(csvdata.strip("\n").split("\n"))
 
-        # Use the CSV dimensions instead of the provided X and Y
-        # to set dimension attributes. This is used for assertion
-        # so nothing is accidentally misreported
-        self.size_h, self.size_w = len(csvdata), len(csvdata[0])
+        terr_layer, t_ctry_layer, awareness_layer = array("H"), array("B"), array("B")
+        size_w = None
+        size_h = 0
 
         # Our maps are lists of rows, not lists of columns ([y][x])
-        # so start with Y, then X
-        for y in range(self.size_h):
-            self.map[y] = dict()
-            for x in range(self.size_w):
-                self.map[y][x] = AWTile(self, x, y, **self.terr_from_awbw(csvdata[y][x]))
+        # so the layers can be filled row by row
+        for row in csvdata:
+            tiles = list(map(AWBW_TERR_DECODE.get, map(int, row), repeat(AWBW_TERR_DECODE_DEFAULT)))
 
-    def _terr_from_aws(self, x: int, y: int, data: List[int]) -> Dict[str, int]:
-        """Use (x, y) coordinate to the appropriate item from data based on map
-        height
+            # Make sure all rows passed are equal length
+            # Calling method will need to catch AssertionError
+            if size_w is None:
+                size_w = len(tiles)
+            assert len(tiles) == size_w
 
-        :param x:       X coordinate of terrain tile
-        :param y:       Y coordinate of terrain tile
-        :param data:    flat list of terrain IDs for map
-        :return:        Dict with Terrain ID and Country ID
-        """
+            for layer, values in zip((terr_layer, t_ctry_layer, awareness_layer), zip(*tiles)):
+                layer.extend(values)
+            size_h += 1
 
-        # TODO: Both of these need to be refactored straight to hell. Needs to be down in from_aws() before AWTiles
+        assert size_h
 
-        # Use (x, y) coordinates to find location of terrain int in flat list
-        offset = y + (x * self.size_h)
+        # Use the CSV dimensions instead of the provided X and Y
+        # to set dimension attributes. This is used for assertion
+        # so nothing is accidentally misreported
+        self.size_h, self.size_w = size_h, size_w
+        self._init_layers()
+        self.terr_layer, self.t_ctry_layer, self.awareness_layer = terr_layer, t_ctry_layer, awareness_layer
+        self._clear_caches()
+        self._build_indexes()
 
-        # Get corresponding Internal Terrain ID and return in dict to splat in AWTile __init__ params
-        terr, t_ctry = AWS_TERR.get(data[offset], (0, 0))  # Default: Plains
-        return {"terr": terr, "t_ctry": t_ctry}
+    def _layer_from_aws(self, layer: int, tables: Dict[int, bytes]) -> bytes:
+        """Read and decode one layer of AWS IDs out of `self.raw_data`
 
-    def _unit_from_aws(self, x: int, y: int, data: List[int]) -> Dict[str, int]:
-        """Use (x, y) coordinate to the appropriate item from data based on map
-        height
+        Layers are stored as 2-byte little endian IDs in sequence as a series
+        of columns ([x][y]). The terrain layer comes first, then the unit layer
 
-        :param x:       X coordinate of tile with unit
-        :param y:       Y coordinate of tile with unit
-        :param data:    flat list of unit IDs for map
-        :return:        Dict with Unit ID and Country ID
+        :param layer:   0 for terrain, 1 for units
+        :param tables:  decode tables for the layer from `aws_decode_table`
+        :return:        `bytes` of codes as a flat list of rows ([y][x])
         """
+        size = self.map_size * 2
+        start = 13 + layer * size
 
-        # Use (x, y) coordinates to find location of unit int in flat list
-        offset = y + (x * self.size_h)
+        # Missing data at the end of a truncated file is read as zeros
+        codes = translate_words(self.raw_data[start:start + size].ljust(size, b"\x00"), tables)
 
-        # Use (x, y) coordinates to find location of unit int in flat list
-        unit, u_ctry = AWS_UNIT.get(data[offset], (0, 0))  # Default: No Unit
-        return {"unit": unit, "u_ctry": u_ctry}
+        # AWS files store data as a list of columns instead of a list of rows
+        # Every row is a strided slice of the columns, so transpose in one go
+        return b"".join(codes[y::self.size_h] for y in range(self.size_h))
 
     @staticmethod
-    def terr_from_awbw(terr: int) -> Dict[str, int]:
-        if terr == 195:
-            main_id, main_ctry = 999, 0
-        else:
-            terr = int(terr)
-            main_id, main_ctry = AWBW_TERR.get(terr, (1, 0))
+    def terr_from_awbw(terr: Union[str, int]) -> Dict[str, int]:
+        main_id, main_ctry, override = AWBW_TERR_DECODE.get(int(terr), AWBW_TERR_DECODE_DEFAULT)
         if main_id in AWBW_AWARENESS["aware_of"].keys():
-            offset = terr - main_terr_to_awbw(main_id, main_ctry)[0]
-            _awareness = AWBW_AWARENESS[main_id]
-            override = list(_awareness.keys())[
-                list(_awareness.values()).index(offset)
-            ]  # TODO: Reeeefaaaactoooor
-
             return {
                 "terr": main_id,
                 "t_ctry": main_ctry,
@@ -334,22 +379,133 @@ class AWMap:
                 "t_ctry": main_ctry,
             }
 
+    def _init_layers(self) -> None:
+        """Allocate empty terrain and unit layers for the current map dimensions"""
+        size = self.map_size
+        self.terr_layer = array("H", bytes(size * 2))
+        self.t_ctry_layer = array("B", bytes(size))
+        self.unit_layer = array("B", bytes(size))
+        self.u_ctry_layer = array("B", bytes(size))
+        self.awareness_layer = array("B", bytes(size))
+
+    def _write(self, i: Optional[int], layer: str, value: int) -> None:
+        """Set the value of one tile in a layer and mark it dirty for the
+        cached exports. Writes to tiles off the map (`i` of `None`) are discarded
+
+        :param i:       index of the tile in the layers
+        :param layer:   name of the layer without the suffix, e.g. "t_ctry"
+        :param value:   new value for the tile"""
+        if i is None:
+            return
+
+        self._index_tile(i, False)
+        getattr(self, f"{layer}_layer")[i] = value
+        self._index_tile(i, True)
+
+        self._digest = None
+        self.version += 1
+        for dirty in self._dirty.values():
+            dirty.add(i)
+
+    def _build_indexes(self) -> None:
+        """Index the properties and units of every country from the layers"""
+        self._ctry_props = dict()
+        self._ctry_units = dict()
+
+        # Only tiles with a country are indexed, so skip straight to them
+        tiles = {m.start() for m in RE_NONZERO.finditer(self.t_ctry_layer)}
+        tiles.update(m.start() for m in RE_NONZERO.finditer(self.u_ctry_layer))
+        for i in tiles:
+            self._index_tile(i, True)
+
+    def _index_tile(self, i: int, add: bool) -> None:
+        """Add a tile to, or remove it from, the indexes of the countries
+        that own its property and unit
+
+        :param i:   index of the tile in the layers
+        :param add: `True` to add the tile, `False` to remove it"""
+
+        t_ctry = self.t_ctry_layer[i]
+        if t_ctry:
+            terr = self.terr_layer[i]
+            kind = "hq" if terr in HQ_TERR else "prod" if terr in PROD_TERR else "other"
+            props = self._ctry_props.setdefault(t_ctry, {"hq": set(), "prod": set(), "other": set()})[kind]
+            if add:
+                props.add(i)
+            else:
+                props.discard(i)
+
+        u_ctry = self.u_ctry_layer[i]
+        if u_ctry:
+            units = self._ctry_units.setdefault(u_ctry, set())
+            if add:
+                units.add(i)
+            else:
+                units.discard(i)
+
+    def _clear_caches(self) -> None:
+        """Drop all cached exports, e.g. after the layers have been replaced"""
+        self._dirty = dict()
+        self._aws_cache = None
+        self._awbw_cache = None
+        self._minimap_cache = None
+        self._digest = None
+        self.version += 1
+
+    @property
+    def exports(self) -> Dict[str, Any]:
+        """Cached exports of the map that can be patched for the next export,
+        by name ("aws", "awbw", "minimap"). Can be passed to `adopt_exports` of a copy
+        of the map, e.g. from a `MapService` worker back to the bot"""
+        exports = dict()
+        if self._aws_cache is not None:
+            exports["aws"] = self._aws_cache
+        if self._awbw_cache is not None and self._awbw_cache[0] == self.override_awareness:
+            exports["awbw"] = self._awbw_cache
+        if self._minimap_cache is not None:
+            exports["minimap"] = self._minimap_cache
+        return exports
+
+    @property
+    def nbytes(self) -> int:
+        """Rough size of the map in memory, in bytes: its layers and
+        cached exports. Used to bound how many maps are kept loaded"""
+        total = sum(len(layer) * layer.itemsize for layer in (
+            self.terr_layer, self.t_ctry_layer, self.unit_layer, self.u_ctry_layer, self.awareness_layer
+        ))
+        if self._aws_cache is not None:
+            total += len(self._aws_cache)
+        if self._awbw_cache is not None:
+            # The joined CSV, plus its rows and cells held for patching
+            total += 2 * len(self._awbw_cache[3])
+        if self._minimap_cache is not None:
+            total += sum(map(len, self._minimap_cache.frames))
+        return total
+
+    def adopt_exports(self, exports: Dict[str, Any]) -> None:
+        """Take over cached exports generated by a copy of this map
+
+        The copy must not have been changed since it was made, and neither
+        must this map. Compare `version` before and after to make sure
+
+        :param exports: `exports` of the copy"""
+        for export, cache in exports.items():
+            setattr(self, f"_{export}_cache", cache)
+            self._dirty[export] = set()
+
+    def index(self, x: int, y: int) -> Optional[int]:
+        """Position of coordinate (x, y) in the map layers
+
+        :return: `int` index or `None` if (x, y) is off the map"""
+        if 0 <= x < self.size_w and 0 <= y < self.size_h:
+            return y * self.size_w + x
+        return None
+
     def tile(self, x: int, y: int) -> AWTile:
         # Return tile object at coordinate (x, y)
-        try:
-            tile = self.map[y][x]
-            try:
-                assert tile.x == x
-                assert tile.y == y
-                return tile
-            except AssertionError:
-                print(f"Received tile from index with differing coordinates\n"
-                      f"Requested:     ({x}, {y})\n"
-                      f"Tile Property: ({tile.x}, {tile.y})\n"
-                      f"Tile Contents: (T: {tile.terr}, U: {tile.unit})")
-                return tile
-        except KeyError:
-            return AWTile(self, x, y, 999, 0)
+        if self.index(x, y) is None:
+            return NullTile(self, x, y)
+        return AWTile(self, x, y)
 
     """ #############
          Map Metrics
@@ -360,42 +516,41 @@ class AWMap:
         """Number of tiles in map"""
         return self.size_h * self.size_w
 
+    @property
+    def digest(self) -> bytes:
+        """BLAKE2b digest of the map dimensions and terrain and unit layers
+
+        Maps with the same terrain and units have the same digest, whatever
+        their metadata or awareness overrides"""
+        if self._digest is None:
+            digest = blake2b(digest_size=16)
+            digest.update(self.size_w.to_bytes(4, "little") + self.size_h.to_bytes(4, "little"))
+            for layer in (self.terr_layer, self.t_ctry_layer, self.unit_layer, self.u_ctry_layer):
+                digest.update(layer)
+            self._digest = digest.digest()
+        return self._digest
+
     @property
     def playable_countries(self) -> Set[int]:
         """Returns a list of playable countries"""
 
-        countries = {
-            i: {
-                "has_hq": False,
-                "has_units": False,
-                "has_prod": False
-            } for i in range(1, 17)
-        }
-
         playable = set()
 
-        for i in countries.keys():
-            props = self.owned_props(i)
-            units = self.deployed_units(i)
-
-            for tile in props:
-
-                # Determine if the country has a HQ or a Lab
-                if tile.is_hq:
-                    countries[i]["has_hq"] = True
+        for i in range(1, 17):
+            props = self._ctry_props.get(i)
 
-                # Determine if the country has a Base, Airport, or Port
-                elif tile.is_prod:
-                    countries[i]["has_prod"] = True
+            # Determine if the country has a HQ or a Lab
+            if not props or not props["hq"]:
+                continue
 
-            for tile in units:
+            # Determine if the country has a Base, Airport, or Port
+            has_prod = bool(props["prod"])
 
-                # Determine if the country has deployed units
-                if tile.unit:
-                    countries[i]["has_units"] = True
+            # Determine if the country has deployed units
+            has_units = any(self.unit_layer[tile] for tile in self._ctry_units.get(i, ()))
 
             # If the country has either HQ type and has either units or production means, it is viable
-            if countries[i]["has_hq"] and (countries[i]["has_units"] or countries[i]["has_prod"]):
+            if has_units or has_prod:
                 playable.add(i)
 
         return playable
@@ -408,29 +563,149 @@ class AWMap:
         :return: List of AWTiles
                  Empty list if no properties are owned by country"""
 
-        tiles = list()
-
-        for tile in self:
-            if tile.t_ctry == t_ctry:
-                tiles.append(tile)
+        if t_ctry:
+            tiles = set().union(*self._ctry_props.get(t_ctry, {}).values())
+        else:
+            # Neutral tiles are not indexed
+            tiles = (i for i, ctry in enumerate(self.t_ctry_layer) if ctry == t_ctry)
 
-        return tiles
+        return [self._tile_at(i) for i in sorted(tiles)]
 
     def deployed_units(self, u_ctry: int) -> List[Optional[AWTile]]:
-        """Returns a list of tiles with properties owned by country
+        """Returns a list of tiles with units deployed by country
 
         :param u_ctry: Internal Country ID
 
         :return: List of AWTiles
-                 Empty list if no properties are owned by country"""
+                 Empty list if no units are deployed by country"""
+
+        if u_ctry:
+            tiles = self._ctry_units.get(u_ctry, ())
+        else:
+            # Tiles without a unit country are not indexed
+            tiles = (i for i, ctry in enumerate(self.u_ctry_layer) if ctry == u_ctry)
+
+        return [self._tile_at(i) for i in sorted(tiles)]
+
+    def _tile_at(self, i: int) -> AWTile:
+        """AWTile at an index in the map layers"""
+        return AWTile(self, i % self.size_w, i // self.size_w)
+
+    """ ################
+         AWBW Awareness
+        ################ """
+
+    @property
+    def awbw_layer(self) -> List[Union[str, int]]:
+        """AWBW Terrain IDs for the whole map as a flat list of rows
+
+        Variations of aware terrain (e.g. Road, River) are resolved for all
+        tiles at once, either from each tile's awareness override or from
+        `awbw_awareness_masks` if `override_awareness` is off"""
+
+        ids = main_terr_to_awbw_layer(self.terr_layer, self.t_ctry_layer)
 
-        tiles = list()
+        aware = [i for i, terr in enumerate(self.terr_layer) if terr in AWBW_AWARE_VARIANTS]
+        if not aware:
+            return ids
 
-        for tile in self:
-            if tile.u_ctry == u_ctry:
-                tiles.append(tile)
+        if self.override_awareness:
+            masks = None
+        else:
+            masks = self.awbw_awareness_masks()
+
+        for i in aware:
+            terr = self.terr_layer[i]
+            mask = self.awareness_layer[i] if masks is None else masks[terr][i]
+            ids[i] = self._awbw_aware_id(terr, self.t_ctry_layer[i], mask)
+
+        return ids
+
+    def awbw_tile_id(self, i: int) -> Union[str, int]:
+        """AWBW Terrain ID of a single tile, resolved the same way as in `awbw_layer`
+
+        :param i: index of the tile in the layers
+        :return: AWBW Terrain ID"""
+
+        terr, t_ctry = self.terr_layer[i], self.t_ctry_layer[i]
+        if terr not in AWBW_AWARE_VARIANTS:
+            return main_terr_to_awbw_layer((terr,), (t_ctry,))[0]
+
+        if self.override_awareness:
+            mask = self.awareness_layer[i]
+        else:
+            # Same mask bits as `awbw_awareness_masks`, for only this tile
+            bit = 1 << AWBW_AWARE_TERR.index(terr)
+            x, y = i % self.size_w, i // self.size_w
+            mask = 0
+            for n, (dx, dy) in enumerate(NEIGHBOURS):
+                adj = self.index(x + dx, y + dy)
+                if adj is not None and AWBW_AWARE_OF_BITS[self.terr_layer[adj]] & bit:
+                    mask |= 1 << n
+
+        return self._awbw_aware_id(terr, t_ctry, mask)
 
-        return tiles
+    @staticmethod
+    def _awbw_aware_id(terr: int, t_ctry: int, mask: int) -> Union[str, int]:
+        """AWBW Terrain ID of the variation of aware terrain for a neighbour mask"""
+        if t_ctry:
+            return main_terr_to_awbw(terr, t_ctry)[AWBW_AWARENESS[terr][mask]]
+        return AWBW_AWARE_VARIANTS[terr][mask]
+
+    def awbw_awareness_masks(self) -> Dict[int, bytes]:
+        """4-bit masks of matching neighbours for every tile, for each aware
+        terrain type present on the map
+
+        Mask bits are the neighbours to the West (1), South (2), East (4),
+        and North (8) whose terrain the aware terrain is aware of. Tiles off
+        the map never match
+
+        :return: dict of aware Internal Terrain ID (keys) to `bytes` with a
+                 mask for each tile as a flat list of rows (values)"""
+
+        w, h = self.size_w, self.size_h
+        row = w + 2
+        size = h * row
+
+        # For each tile, bitfield of which aware terrain types are aware of it
+        member = bytes(map(AWBW_AWARE_OF_BITS.__getitem__, self.terr_layer))
+
+        # Pad the grid with a border of tiles off the map on every side
+        padded = b"".join((
+            bytes(row),
+            *(b"\x00" + member[y * w:(y + 1) * w] + b"\x00" for y in range(h)),
+            bytes(row)
+        ))
+
+        masks = dict()
+        present = set(self.terr_layer)
+
+        for bit, terr in enumerate(AWBW_AWARE_TERR):
+            if terr not in present:
+                continue
+
+            # 1 for every padded tile this terrain type is aware of, else 0
+            flags = padded.translate(bytes((b >> bit) & 1 for b in range(256)))
+
+            # Shift the grid by one tile in each direction to line up the
+            # West, South, East, and North neighbours of every padded row
+            # with the tile itself, then stack them into the mask bits. Each
+            # byte is 0 or 1, so shifting the whole int never carries between tiles
+            neighbours = (
+                flags[row - 1:row - 1 + size],
+                flags[2 * row:2 * row + size],
+                flags[row + 1:row + 1 + size],
+                flags[0:size]
+            )
+            mask = 0
+            for i, plane in enumerate(neighbours):
+                mask |= int.from_bytes(plane, "little") << i
+            mask = mask.to_bytes(size, "little")
+
+            # Drop the padding columns
+            masks[terr] = b"".join(mask[y * row + 1:y * row + 1 + w] for y in range(h))
+
+        return masks
 
     """ ##################
          Map Manipulation
@@ -442,20 +717,52 @@ class AWMap:
 
     def mod_unit(self, x: int, y: int, unit: int, u_ctry: int) -> None:
         """Changes unit value of tile at (x, y) using Internal Unit and Country IDs"""
-        self.tile(x, y).mod_terr(unit, u_ctry)
+        self.tile(x, y).mod_unit(unit, u_ctry)
 
     @property
     def to_awbw(self) -> str:
-        """CSV of AWBW Terrain IDs representing map returned as multiline string"""
-        csvdata = '\n'.join(
-            [','.join(
-                [
-                    str(self.tile(x, y).awbw_id)
-                    for x in range(self.size_w)
-                ]
-            ) for y in range(self.size_h)]
-        )
-        return csvdata
+        """CSV of AWBW Terrain IDs representing map returned as multiline string
+
+        The CSV is cached. Later calls only regenerate the cells of tiles
+        changed since, along with their neighbours if awareness is computed
+        from surroundings, and only rejoin the rows those cells are in"""
+
+        w = self.size_w
+        dirty = self._dirty.get("awbw")
+
+        # Toggling override_awareness can change any aware tile. Start over
+        if self._awbw_cache is None or self._awbw_cache[0] != self.override_awareness:
+            awbw_ids = self.awbw_layer
+            rows = [','.join(map(str, awbw_ids[y * w:(y + 1) * w])) for y in range(self.size_h)]
+            self._awbw_cache = (self.override_awareness, awbw_ids, rows, '\n'.join(rows))
+            self._dirty["awbw"] = set()
+
+        elif dirty:
+            _, awbw_ids, rows, _ = self._awbw_cache
+
+            tiles = set(dirty)
+            if not self.override_awareness:
+                for i in dirty:
+                    x, y = i % w, i // w
+                    tiles.update(
+                        adj for adj in (self.index(x + dx, y + dy) for dx, dy in NEIGHBOURS) if adj is not None
+                    )
+
+            changed = set()
+            for i in tiles:
+                awbw_id = self.awbw_tile_id(i)
+                if awbw_ids[i] != awbw_id:
+                    awbw_ids[i] = awbw_id
+                    changed.add(i // w)
+
+            for y in changed:
+                rows[y] = ','.join(map(str, awbw_ids[y * w:(y + 1) * w]))
+
+            if changed:
+                self._awbw_cache = (self.override_awareness, awbw_ids, rows, '\n'.join(rows))
+            dirty.clear()
+
+        return self._awbw_cache[3]
 
     @property
     def to_aws(self) -> bytearray:
@@ -463,78 +770,126 @@ class AWMap:
 
         The bytearray object returned can be written to a file with .AWS extension
         """
+        ret = BytesIO()
+        self.write_aws(ret)
+        return bytearray(ret.getbuffer())
+
+    def write_aws(self, fp: BinaryIO) -> None:
+        """Write the map as an AWS map file to a binary file-like object
 
-        # Start bytes with header for AWS map file
-        ret = bytearray(b'AWSMap001') + b'\x00'
+        Header, terrain and unit layers, and metadata are each written to
+        `fp` as a single chunk. `fp` is left positioned at the end of the data
+
+        :param fp: file-like object opened for writing bytes, e.g. `BytesIO`
+        """
 
         # If style is not set, default to AW2 Clear style
         style = self.style if self.style else 5
 
-        # Add map dimensions and metadata
-        for b in [m.to_bytes(1, 'little') for m in [self.size_w, self.size_h, style]]:
-            ret += b
-
-        # Reorganize the terrain data back into a flat list of columns ([x][y])
-        terr_data = [
-            terr.to_bytes(2, 'little')
-            for terr in [
-                self.tile(x, y).aws_terr_id
-                for x in range(self.size_w)
-                for y in range(self.size_h)
-            ]
-        ]
-
-        # Add the terrain data sequentially
-        for t in terr_data:
-            ret += t
-
-        # Reorganize the unit data back into a flat list of columns ([x][y])
-        unit_data = [
-            unit.to_bytes(2, 'little')
-            for unit in [
-                self.tile(x, y).aws_unit_id
-                for x in range(self.size_w)
-                for y in range(self.size_h)
-            ]
-        ]
+        # Header for AWS map file followed by map dimensions and style
+        fp.write(b"AWSMap001\x00")
+        fp.write(bytes((self.size_w, self.size_h, style)))
 
-        # Add the unit data sequentially
-        for u in unit_data:
-            ret += u
+        # Terrain data, then unit data, each as a flat list of columns ([x][y])
+        fp.write(self._aws_layers())
 
-        # Add the map metadata at the end
-        ret += len(self.title).to_bytes(4, 'little') + self.title.encode('utf-8')
-        ret += len(self.author).to_bytes(4, 'little') + self.author.encode('utf-8')
-        ret += len(self.desc).to_bytes(4, 'little') + self.desc.encode('utf-8')
+        # Add the map metadata at the end. Sizes are byte lengths of the UTF-8
+        for metadata in (self.title, self.author, self.desc):
+            metadata = metadata.encode("utf-8")
+            fp.write(len(metadata).to_bytes(4, "little") + metadata)
 
-        return ret
+    def _aws_layers(self) -> bytearray:
+        """Terrain and unit layers as stored in AWS files, from the cache
+
+        The layers are encoded in full the first time. After that, only the
+        IDs of tiles changed since are patched into the cached bytes
+
+        :return: `bytearray` of the terrain layer followed by the unit layer"""
+
+        dirty = self._dirty.get("aws")
+
+        if self._aws_cache is None:
+            self._aws_cache = bytearray(
+                self._layer_to_aws(main_terr_to_aws_layer(self.terr_layer, self.t_ctry_layer))
+                + self._layer_to_aws(main_unit_to_aws_layer(self.unit_layer, self.u_ctry_layer))
+            )
+            self._dirty["aws"] = set()
+
+        elif dirty:
+            units = self.map_size * 2
+            for i in dirty:
+                # Byte offset of the tile in a list of columns ([x][y])
+                offset = ((i % self.size_w) * self.size_h + i // self.size_w) * 2
+
+                terr = main_terr_to_aws_layer((self.terr_layer[i],), (self.t_ctry_layer[i],))[0]
+                unit = main_unit_to_aws_layer((self.unit_layer[i],), (self.u_ctry_layer[i],))[0]
+                self._aws_cache[offset:offset + 2] = terr.to_bytes(2, "little")
+                self._aws_cache[units + offset:units + offset + 2] = unit.to_bytes(2, "little")
+            dirty.clear()
+
+        return self._aws_cache
+
+    def _layer_to_aws(self, rows: array) -> bytes:
+        """Lay out one layer of AWS IDs the way it is stored in AWS files
+
+        :param rows:    AWS IDs as a flat list of rows ([y][x])
+        :return:        2-byte little endian AWS IDs as a flat list of columns ([x][y])
+        """
+
+        # Every column is a strided slice of the rows, so transpose in one go
+        columns = array("H", bytes(len(rows) * 2))
+        for x in range(self.size_w):
+            columns[x * self.size_h:(x + 1) * self.size_h] = rows[x::self.size_w]
+
+        if byteorder == "big":
+            columns.byteswap()
+
+        return columns.tobytes()
 
     @property
     def minimap(self) -> BytesIO:
-        return AWMinimap(self).map
+        """Minimap image of the map, from `MINIMAP_CACHE` if it has been rendered before"""
+        image = MINIMAP_CACHE.get(self.digest)
+        if image is None:
+            image = AWMinimap(self).map.getvalue()
+            MINIMAP_CACHE.put(self.digest, image)
+        return BytesIO(image)
+
+    @property
+    def minimap_frames(self) -> "MinimapFrames":
+        """Unencoded frames of the minimap, from the cache
+
+        The frames are painted in full the first time. After that, only
+        the tiles changed since are repainted. Minimap sprites don't depend
+        on awareness, so neighbours of changed tiles are left as they are"""
+
+        dirty = self._dirty.get("minimap")
+
+        if self._minimap_cache is None:
+            self._minimap_cache = MinimapFrames(self)
+            self._dirty["minimap"] = set()
+
+        elif dirty:
+            self._minimap_cache.paint(self, dirty)
+            dirty.clear()
+
+        return self._minimap_cache
 
 
 class AWTile:  # TODO: Account for multi-tile terrain objects e.g. death ray, volcano, etc.
+    """View of a single tile in an `AWMap`
 
-    def __init__(
-            self,
-            awmap: AWMap,
-            x: int = 0,
-            y: int = 0,
-            terr: int = 0,
-            t_ctry: int = 0,
-            unit: int = 0,
-            u_ctry: int = 0,
-            awareness_override: int = 0
-    ):
+    Holds no terrain or unit data of its own. Reads and writes go straight
+    to the layers of `awmap`, so tiles are cheap to create on demand and are
+    never stored"""
+
+    __slots__ = ("awmap", "x", "y", "i")
+
+    def __init__(self, awmap: AWMap, x: int = 0, y: int = 0):
+        self.awmap = awmap
         self.x = x
         self.y = y
-        self.terr = terr
-        self.t_ctry = t_ctry
-        self.unit = unit
-        self.u_ctry = u_ctry
-        self.awmap = awmap
-        self.awareness_override = awareness_override
+        self.i = y * awmap.size_w + x
 
     def __repr__(self) -> str:
         return f"({self.x + 1}, {self.y + 1}): " \
@@ -548,13 +903,53 @@ class AWTile:  # TODO: Account for multi-tile terrain objects e.g. death ray, vo
         """ Grab the AWTile object from AWMap using AWMap.tile()"""
         return self.awmap.tile(x, y)
 
+    @property
+    def terr(self) -> int:
+        return self.awmap.terr_layer[self.i]
+
+    @terr.setter
+    def terr(self, value: int) -> None:
+        self.awmap._write(self.i, "terr", value)
+
+    @property
+    def t_ctry(self) -> int:
+        return self.awmap.t_ctry_layer[self.i]
+
+    @t_ctry.setter
+    def t_ctry(self, value: int) -> None:
+        self.awmap._write(self.i, "t_ctry", value)
+
+    @property
+    def unit(self) -> int:
+        return self.awmap.unit_layer[self.i]
+
+    @unit.setter
+    def unit(self, value: int) -> None:
+        self.awmap._write(self.i, "unit", value)
+
+    @property
+    def u_ctry(self) -> int:
+        return self.awmap.u_ctry_layer[self.i]
+
+    @u_ctry.setter
+    def u_ctry(self, value: int) -> None:
+        self.awmap._write(self.i, "u_ctry", value)
+
+    @property
+    def awareness_override(self) -> int:
+        return self.awmap.awareness_layer[self.i]
+
+    @awareness_override.setter
+    def awareness_override(self, value: int) -> None:
+        self.awmap._write(self.i, "awareness", value)
+
     @property
     def terr_name(self) -> str:
         return MAIN_TERR.get(self.terr, "InvalidTerrID")
 
     @property
     def is_hq(self) -> bool:
-        return self.terr in (101, 107)
+        return self.terr in HQ_TERR
 
     @property
     def is_prop(self) -> bool:
@@ -562,7 +957,7 @@ class AWTile:  # TODO: Account for multi-tile terrain objects e.g. death ray, vo
 
     @property
     def is_prod(self) -> bool:
-        return self.terr in (103, 104, 105)
+        return self.terr in PROD_TERR
 
     @property
     def aws_terr_id(self) -> int:
@@ -598,11 +993,8 @@ class AWTile:  # TODO: Account for multi-tile terrain objects e.g. death ray, vo
             terr = self.terr
 
         awareness_mask = 0
-        for i in range(4):
-            adj = self.tile(
-                    self.x - trunc(sin(pi * (i + 1)/2)),
-                    self.y - trunc(cos(pi * (i + 1)/2))
-            )
+        for i, (x, y) in enumerate(NEIGHBOURS):
+            adj = self.tile(self.x + x, self.y + y)
             if adj.terr == terr:
                 awareness_mask += 2 ** i
 
@@ -626,101 +1018,269 @@ class AWTile:  # TODO: Account for multi-tile terrain objects e.g. death ray, vo
             raise ValueError("Invalid Unit Data")
 
 
+class NullTile(AWTile):
+    """Tile returned for coordinates outside of the map
+
+    Has no slot in the map layers. Reads as a NullTile terrain and changes
+    made to it are discarded"""
+
+    __slots__ = ()
+
+    def __init__(self, awmap: AWMap, x: int = 0, y: int = 0):
+        super().__init__(awmap, x, y)
+        self.i = None
+
+    # Reads are fixed and writes are dropped. `mod_terr` and `mod_unit`
+    # still validate the IDs given before their writes are dropped here
+
+    @property
+    def terr(self) -> int:
+        return 999
+
+    @terr.setter
+    def terr(self, value: int) -> None:
+        pass
+
+    @property
+    def t_ctry(self) -> int:
+        return 0
+
+    @t_ctry.setter
+    def t_ctry(self, value: int) -> None:
+        pass
+
+    @property
+    def unit(self) -> int:
+        return 0
+
+    @unit.setter
+    def unit(self, value: int) -> None:
+        pass
+
+    @property
+    def u_ctry(self) -> int:
+        return 0
+
+    @u_ctry.setter
+    def u_ctry(self, value: int) -> None:
+        pass
+
+    @property
+    def awareness_override(self) -> int:
+        return 0
+
+    @awareness_override.setter
+    def awareness_override(self, value: int) -> None:
+        pass
+
+
 class AWMinimap:
 
-    def __init__(self, awmap: AWMap):
-        self.im = new("RGBA", (4 * awmap.size_w, 4 * awmap.size_h))
+    # Sprites compiled from BITMAP_SPEC on first use, keyed by combined
+    # terrain + country * 10 ID, and unit + country * 100 ID. Values are
+    # (sprite, animated), the same as returned by `get_sprite`
+    terr_atlas: Dict[int, Tuple[Union[Image, List[Image]], bool]] = dict()
+    unit_atlas: Dict[int, Tuple[List[Image], bool]] = dict()
+    blank_sprite: Optional[Tuple[Image, bool]] = None
+
+    # The same sprites as palette indexes, one byte per pixel, keyed by
+    # sprite size in pixels first. A list of 1 frame for static sprites
+    # or 8 frames for animated sprites
+    terr_pixels: Dict[int, Dict[int, List[bytes]]] = dict()
+    unit_pixels: Dict[int, Dict[int, List[bytes]]] = dict()
+    blank_pixels: Dict[int, List[bytes]] = {size: [bytes(size * size)] for size in SPRITE_SIZES}
+
+    # RGB palette shared by every minimap. Index 0 is transparent
+    palette: bytes = b""
+
+    def __init__(self, source: Union[AWMap, "MinimapFrames"]):
+        """
+        :param source: map to render, or its already painted `MinimapFrames`
+        """
+        self.im = None
         self.ims = list()
-        self.animated = False
-        self.anim_buffer = list()
         self.final_im = None
 
-        # Add all terrain sprites (buffer animated sprites)
-        for x in range(awmap.size_w):
-            for y in range(awmap.size_h):
-                terr = awmap.tile(x, y).terr + (awmap.tile(x, y).t_ctry * 10)
-                sprite, animated = AWMinimap.get_sprite(terr)
-                if animated:
-                    self.anim_buffer.append((x, y, sprite))
-                    self.animated = True
-                    continue
-                self.im.paste(sprite, (x * 4, y * 4))
-
-        # Add all unit sprites to buffer
-        for x in range(awmap.size_w):
-            for y in range(awmap.size_h):
-                unit = awmap.tile(x, y).unit + (awmap.tile(x, y).u_ctry * 100)
-                if unit:
-                    sprite, _ = AWMinimap.get_sprite(unit, True)
-                    self.animated = True
-                    self.anim_buffer.append((x, y, sprite))
-
-        # Copy map to 8 frames, then add the animated sprites
-        if self.animated:
-            self.ims = []
-            for _ in range(8):
-                self.ims.append(self.im.copy())
-            for x, y, sprite in self.anim_buffer:
-                for i in range(8):
-                    self.ims[i].paste(
-                        sprite[i],
-                        (x * 4, y * 4, (x * 4) + 4, (y * 4) + 4),
-                        sprite[i]
-                    )
+        # Seconds spent painting the frames, if painted here, and encoding them
+        self.timings: Dict[str, float] = dict()
 
-        # Smaller maps can be sized up
-        if awmap.size_w * awmap.size_h <= 1600:
-            if self.animated:
-                for i, f in enumerate(self.ims):
-                    self.ims[i] = f.resize(
-                        (awmap.size_w * 16, awmap.size_h * 16),
-                        resample=Resampling.NEAREST
-                    )
-            else:
-                self.im = self.im.resize((awmap.size_w * 16, awmap.size_h * 16), resample=Resampling.NEAREST)
-        elif awmap.size_w * awmap.size_h <= 3200:
-            if self.animated:
-                for i, f in enumerate(self.ims):
-                    self.ims[i] = f.resize(
-                        (awmap.size_w * 8, awmap.size_h * 8),
-                        resample=Resampling.NEAREST
-                    )
-            else:
-                self.im = self.im.resize((awmap.size_w * 8, awmap.size_h * 8), resample=Resampling.NEAREST)
+        # Frames painted in another process need the palette compiled here too
+        if not AWMinimap.terr_atlas:
+            AWMinimap.compile_atlas()
+
+        begin = perf_counter()
+        if isinstance(source, AWMap):
+            frames = source.minimap_frames
+            self.timings["paint"] = perf_counter() - begin
+            begin = perf_counter()
+        else:
+            frames = source
+        w, h, size = frames.size_w, frames.size_h, frames.size
+
+        # Any animated terrain or any unit makes the minimap animated
+        self.animated = len(frames.frames) > 1
+
+        # Frames identical to the one before are merged into it, lengthening
+        # its duration instead (e.g. units only blink in frames 2 to 5)
+        self.durations = list()
+        last = None
+        for data in frames.frames:
+            if data == last:
+                self.durations[-1] += FRAME_DURATION
+                continue
+            last = data
+
+            im = frombytes("P", (size * w, size * h), bytes(data))
+            im.putpalette(AWMinimap.palette)
+            im.info["transparency"] = 0
+            self.ims.append(im)
+            self.durations.append(FRAME_DURATION)
+
+        if not self.animated:
+            self.im = self.ims.pop()
 
         if self.animated:
-            self.final_im = AWMinimap.compile_gif(self.ims)
+            self.final_im = AWMinimap.compile_gif(self.ims, self.durations)
         else:
             img = BytesIO()
-            self.im.save(fp=img, format="PNG", )
+            self.im.save(fp=img, format="PNG", transparency=0)
             img.seek(0)
             self.final_im = img
 
+        self.timings["encode"] = perf_counter() - begin
+
+    @staticmethod
+    def compose_tile(terr_id: int, unit_id: int, size: int = 4) -> List[bytes]:
+        """Composite the unit sprite over the terrain sprite for one tile
+
+        Sprite pixels are either fully opaque or fully transparent, so
+        masking a unit in with its own alpha is the same as copying its
+        opaque pixels over the terrain
+
+        :param terr_id: terrain + country * 10
+        :param unit_id: unit + country * 100, or 0 for no unit
+        :param size: sprite size in pixels, one of `SPRITE_SIZES`
+        :return: list of palette indexes, `size` rows of `size` pixels, for
+                 each frame. One frame if the tile is not animated, otherwise 8"""
+        if not AWMinimap.terr_atlas:
+            AWMinimap.compile_atlas()
+
+        terr = AWMinimap.terr_pixels[size].get(terr_id, AWMinimap.blank_pixels[size])
+        if not unit_id:
+            return terr
+
+        unit = AWMinimap.unit_pixels[size].get(unit_id, AWMinimap.blank_pixels[size])
+
+        blank = AWMinimap.blank_pixels[size][0]
+        frames = list()
+        for i in range(8):
+            unit_frame = unit[i % len(unit)]
+            if unit_frame == blank:
+                # Units are only drawn in some frames
+                frames.append(terr[i % len(terr)])
+                continue
+
+            terr_frame = int.from_bytes(terr[i % len(terr)], "little")
+            mask = int.from_bytes(unit_frame.translate(OPAQUE), "little")
+            pixels = int.from_bytes(unit_frame, "little") & mask | terr_frame & ~mask
+            frames.append(pixels.to_bytes(size * size, "little"))
+
+        return frames
+
     @staticmethod
     def get_sprite(
             sprite_id: int,
             unit: bool = False
     ) -> Union[Tuple[Image, bool], Tuple[List[Image], bool]]:
-        if unit:
-            if sprite_id in [i for v in UNIT_ID_TO_SPEC.values() for i in v]:
-                sprite_name = [k for k, v in UNIT_ID_TO_SPEC.items() if sprite_id in v][0]
-                return AWMinimap.get_unit_sprite(sprite_name)
-            else:
-                return new("RGBA", (4, 4)), False
-        else:
-            if sprite_id in [i for v in STATIC_ID_TO_SPEC.values() for i in v]:
-                sprite_name = [
-                    k
-                    for k, v
-                    in STATIC_ID_TO_SPEC.items()
-                    if sprite_id in v
-                ][0]
-                return AWMinimap.get_static_sprite(sprite_name)
-            elif sprite_id in [i for v in ANIM_ID_TO_SPEC.values() for i in v]:
-                sprite_name = [k for k, v in ANIM_ID_TO_SPEC.items() if sprite_id in v][0]
-                return AWMinimap.get_anim_sprite(sprite_name)
-            else:
-                return new("RGBA", (4, 4)), False
+        """Sprite for a combined terrain or unit ID from the sprite atlas
+
+        Sprites are shared between calls and must not be modified
+
+        :param sprite_id: terrain + country * 10, or unit + country * 100
+        :param unit: `True` if `sprite_id` is a unit
+        :return: (sprite, animated). Animated sprites are lists of 8 frames.
+                 IDs without a sprite get a blank static sprite"""
+        if not AWMinimap.terr_atlas:
+            AWMinimap.compile_atlas()
+
+        atlas = AWMinimap.unit_atlas if unit else AWMinimap.terr_atlas
+        return atlas.get(sprite_id, AWMinimap.blank_sprite)
+
+    @staticmethod
+    def compile_atlas() -> None:
+        """Draw every sprite in BITMAP_SPEC once and fill the sprite atlases
+
+        Where an ID is listed for more than one sprite, the first one found
+        is used, static terrain before animated terrain"""
+        terr_atlas = dict()
+        for sprite_name, ids in STATIC_ID_TO_SPEC.items():
+            sprite = AWMinimap.get_static_sprite(sprite_name)
+            for sprite_id in ids:
+                terr_atlas.setdefault(sprite_id, sprite)
+        for sprite_name, ids in ANIM_ID_TO_SPEC.items():
+            sprite = AWMinimap.get_anim_sprite(sprite_name)
+            for sprite_id in ids:
+                terr_atlas.setdefault(sprite_id, sprite)
+
+        unit_atlas = dict()
+        for sprite_name, ids in UNIT_ID_TO_SPEC.items():
+            sprite = AWMinimap.get_unit_sprite(sprite_name)
+            for sprite_id in ids:
+                unit_atlas.setdefault(sprite_id, sprite)
+
+        # Sprites shared by several IDs share their pixel data too
+        pixels = dict()
+        for sprite, animated in (*terr_atlas.values(), *unit_atlas.values()):
+            if id(sprite) not in pixels:
+                pixels[id(sprite)] = [im.tobytes() for im in sprite] if animated else [sprite.tobytes()]
+
+        # Every colour used by the sprites gets an index in the palette after
+        # transparent. Sprites are drawn in opaque colours from BITMAP_PALETTE
+        transparent = bytes(4)
+        colors = {
+            frame[i:i + 4]
+            for frames in pixels.values()
+            for frame in frames
+            for i in range(0, 64, 4)
+        }
+        colors.discard(transparent)
+        colors = [transparent, *sorted(colors)]
+        assert len(colors) <= 256
+
+        index = {color: i for i, color in enumerate(colors)}
+        for key, frames in pixels.items():
+            pixels[key] = [bytes(index[frame[i:i + 4]] for i in range(0, 64, 4)) for frame in frames]
+
+        # Larger sprites are the same sprites with every pixel repeated into
+        # a square, the same as resizing them with nearest neighbour sampling
+        scaled = {
+            size: {key: [AWMinimap.scale_pixels(frame, size) for frame in frames] for key, frames in pixels.items()}
+            for size in SPRITE_SIZES
+        }
+
+        AWMinimap.palette = b"".join(color[:3] for color in colors)
+        AWMinimap.blank_sprite = new("RGBA", (4, 4)), False
+        AWMinimap.unit_pixels = {
+            size: {k: scaled[size][id(sprite)] for k, (sprite, _) in unit_atlas.items()}
+            for size in SPRITE_SIZES
+        }
+        AWMinimap.terr_pixels = {
+            size: {k: scaled[size][id(sprite)] for k, (sprite, _) in terr_atlas.items()}
+            for size in SPRITE_SIZES
+        }
+        AWMinimap.unit_atlas = unit_atlas
+        AWMinimap.terr_atlas = terr_atlas
+
+    @staticmethod
+    def scale_pixels(pixels: bytes, size: int) -> bytes:
+        """Scale up a 4x4 sprite's palette indexes to `size` x `size`
+
+        :param pixels: 4 rows of 4 palette indexes
+        :param size: sprite size in pixels, a multiple of 4
+        :return: `size` rows of `size` palette indexes"""
+        scale = size // 4
+        rows = (bytes(p for p in pixels[r * 4:(r + 1) * 4] for _ in range(scale)) for r in range(4))
+        return b"".join(row * scale for row in rows)
 
     @staticmethod
     def get_static_sprite(sprite_name: str) -> Tuple[Image, bool]:
@@ -757,7 +1317,36 @@ class AWMinimap:
         return ims, True
 
     @staticmethod
-    def compile_gif(frames: List[Image]) -> BytesIO:
+    def compile_gif(frames: List[Image], durations: Union[int, List[int]] = FRAME_DURATION) -> BytesIO:
+        """Encode minimap frames as a looping GIF
+
+        Frames are palette images sharing `AWMinimap.palette`, which is
+        written once as the global colour table. After the first frame, only
+        the pixels that changed from the frame before are stored, within the
+        area they changed in. The rest are left transparent to show the
+        frame before through
+
+        :param frames: "P" mode frames using `AWMinimap.palette`
+        :param durations: duration of every frame, or of each frame, in ms
+        :return: `BytesIO` of the GIF"""
+        data = [frame.tobytes() for frame in frames]
+        opaque = [int.from_bytes(frame.translate(OPAQUE), "little") for frame in data]
+
+        # A pixel can't turn transparent over a frame that is not disposed of
+        # when the animation moves on. If any do (including when looping back
+        # to the first frame), every frame is cleared and drawn whole instead
+        if any(opaque[i - 1] & ~opaque[i] for i in range(len(frames))):
+            disposal = 2
+        else:
+            disposal = 1
+            for i in range(len(frames) - 1, 0, -1):
+                frame = int.from_bytes(data[i], "little")
+                changed = (frame ^ int.from_bytes(data[i - 1], "little")).to_bytes(len(data[i]), "little")
+                delta = frame & int.from_bytes(changed.translate(OPAQUE), "little")
+
+                frames[i] = frombytes("P", frames[i].size, delta.to_bytes(len(data[i]), "little"))
+                frames[i].putpalette(AWMinimap.palette)
+
         img_bytes = BytesIO()
         first_frame = frames.pop(0)
         first_frame.save(
@@ -766,7 +1355,10 @@ class AWMinimap:
             save_all=True,
             append_images=frames,
             loop=0,
-            duration=150,
+            duration=durations,
+            disposal=disposal,
+            palette=AWMinimap.palette,
+            transparency=0,
             optimize=False,
             version='GIF89a'
         )
@@ -776,3 +1368,162 @@ class AWMinimap:
     @property
     def map(self) -> BytesIO:
         return self.final_im
+
+
+class MinimapFrames:
+    """Unencoded frames of a map's minimap, as palette indexes
+
+    Kept with the map so that after an edit only the tiles that changed are
+    repainted before the minimap is encoded again. A list of 1 frame if the
+    minimap is not animated, otherwise 8"""
+
+    def __init__(self, awmap: AWMap) -> None:
+        w, h = self.size_w, self.size_h = awmap.size_w, awmap.size_h
+
+        # Smaller maps are drawn with larger sprites
+        if w * h <= 1600:
+            self.size = 16
+        elif w * h <= 3200:
+            self.size = 8
+        else:
+            self.size = 4
+        size = self.size
+
+        # Combined sprite IDs for every tile as a flat list of rows
+        terr_ids = map(add, awmap.terr_layer, map(mul, awmap.t_ctry_layer, repeat(10)))
+        unit_ids = map(add, awmap.unit_layer, map(mul, awmap.u_ctry_layer, repeat(100)))
+
+        # Number every distinct pair of terrain and unit sprite on the map.
+        # Each pair is only composited once, then the map is a grid of pairs
+        pairs = dict()
+        grid = [pairs.setdefault(pair, len(pairs)) for pair in zip(terr_ids, unit_ids)]
+        tiles = [AWMinimap.compose_tile(terr, unit, size) for terr, unit in pairs]
+
+        # Whether each tile is animated, and how many are. Any animated
+        # terrain or any unit makes the minimap animated
+        animated = [len(tile) > 1 for tile in tiles]
+        self.animated_tiles = bytearray(map(animated.__getitem__, grid))
+        self.animated: int = self.animated_tiles.count(1)
+
+        # Each frame is built as one run of palette indexes. Every row of pixels
+        # is the same row of the tiles along a row of the map joined together.
+        # Scaled up sprites repeat each of their 4 distinct rows, so those are
+        # joined once and repeated
+        scale = size // 4
+        rows = [grid[y * w:(y + 1) * w] for y in range(h)]
+        self.frames: List[bytearray] = list()
+        for frame in range(8 if self.animated else 1):
+            sprite_rows = [
+                [tile[frame % len(tile)][r * scale * size:(r * scale + 1) * size] for tile in tiles]
+                for r in range(4)
+            ]
+            self.frames.append(bytearray(b"".join(
+                b"".join(map(sprite_rows[r].__getitem__, row)) * scale
+                for row in rows
+                for r in range(4)
+            )))
+
+    def paint(self, awmap: AWMap, tiles: Iterable[int]) -> None:
+        """Repaint tiles of the map in every frame
+
+        :param awmap: the map the frames were painted from, after its edits
+        :param tiles: indexes of the tiles to repaint"""
+        w, size = self.size_w, self.size
+
+        painted = list()
+        for i in tiles:
+            tile = AWMinimap.compose_tile(
+                awmap.terr_layer[i] + awmap.t_ctry_layer[i] * 10,
+                awmap.unit_layer[i] + awmap.u_ctry_layer[i] * 100,
+                size
+            )
+            self.animated += (len(tile) > 1) - self.animated_tiles[i]
+            self.animated_tiles[i] = len(tile) > 1
+            painted.append((i, tile))
+
+        # The first animated tile on a static minimap needs all 8 frames
+        if self.animated and len(self.frames) == 1:
+            self.frames.extend(bytearray(self.frames[0]) for _ in range(7))
+
+        stride = w * size
+        for i, tile in painted:
+            x, y = i % w, i // w
+            for f, frame in enumerate(self.frames):
+                pixels = tile[f % len(tile)]
+                for r in range(size):
+                    offset = (y * size + r) * stride + x * size
+                    frame[offset:offset + size] = pixels[r * size:(r + 1) * size]
+
+        # Without animated tiles left, every frame is the same
+        if not self.animated:
+            del self.frames[1:]
+
+
+class MinimapCache:
+    """LRU cache of encoded minimap images keyed by `AWMap.digest`
+
+    Bounded by the total size of the images it holds instead of by the
+    number of maps. Images larger than the bound are not cached"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+
+        # Total size of the images held, in bytes
+        self.size: int = 0
+
+        # Lookups since the cache was created or last cleared
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self._images: OrderedDict[bytes, bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self._images
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """Encoded image for a map digest, marked as most recently used
+
+        :param key: `AWMap.digest` of the map
+        :return: `bytes` of the image or `None` if not cached"""
+        image = self._images.get(key)
+        if image is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._images.move_to_end(key)
+        return image
+
+    def put(self, key: bytes, image: bytes) -> None:
+        """Cache the encoded image for a map digest, evicting the least
+        recently used images until the cache is back within `max_bytes`
+
+        :param key: `AWMap.digest` of the map
+        :param image: `bytes` of the encoded image"""
+        if key in self._images:
+            self.size -= len(self._images.pop(key))
+
+        if len(image) > self.max_bytes:
+            return
+
+        self._images[key] = image
+        self.size += len(image)
+
+        while self.size > self.max_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self) -> None:
+        """Drop all cached images and reset the counters"""
+        self._images.clear()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+
+# Shared by all maps so the same map loaded again, e.g. from another AWBW
+# link to it, is not rendered again
+MINIMAP_CACHE = MinimapCache()
@@ -4,9 +4,10 @@ from __future__ import annotations
 # Lib
 from asyncio import CancelledError
 from asyncio.tasks import sleep
+from os import urandom
 from re import match
 from traceback import extract_tb
-from typing import Any, Dict, Generator, List, Set, Tuple, Union
+from typing import Any, Callable, Dict, Generator, List, Optional, Set, Tuple, Union
 
 # Site
 from discord.appinfo import AppInfo
@@ -20,9 +21,11 @@ from discord.ext.commands.converter import IDConverter
 from discord.ext.commands.errors import BadArgument
 from discord.message import Message
 from discord.utils import get, find
-from redis.client import StrictRedis as DefaultStrictRedis
+from redis.client import PubSub, StrictRedis as DefaultStrictRedis
 
 # Local
+from utils.awbw_api import AWBWClient, MAPS_API, UNSECURED_MAPS_API
+from utils.map_service import MapService
 from utils.tools import ZWSP, bool_transform, _get_from_guilds
 
 
@@ -361,6 +364,24 @@ class Bot(DiscordBot):
         # Used by timer cog
         self.secs: int = 0
 
+        # Worker processes for parsing, rendering, and exporting maps made available to cogs
+        self.map_service: MapService = MapService(
+            workers=int(kwargs.pop("map_workers", 0)) or None,
+            max_jobs=int(kwargs.pop("map_jobs", 8)),
+            timeout=float(kwargs.pop("map_timeout", 30))
+        )
+
+        # Client for the AWBW Maps API made available to cogs. Responses are cached in db
+        awbw_api = kwargs.pop("awbw_api", None)
+        self.awbw: AWBWClient = AWBWClient(
+            api=awbw_api or MAPS_API,
+            unsecured_api=awbw_api or UNSECURED_MAPS_API,
+            ttl=int(kwargs.pop("awbw_ttl", 60 * 60)),
+            max_requests=int(kwargs.pop("awbw_requests", 4)),
+            rate=float(kwargs.pop("awbw_rate", 5)),
+            db=SubRedis(self.db, "awbw:maps") if self.db else None
+        )
+
         # Declaring first. This will not be able to get set until login
         self.app_info: AppInfo = kwargs.get("app_info", None)
 
@@ -373,6 +394,9 @@ class Bot(DiscordBot):
         # Supress IDE errors
         self.send_help_for = None
 
+        # Prefix settings from db, kept in memory for `command_prefix` in main.py
+        self.prefixes: Optional[PrefixCache] = PrefixCache(SubRedis(self.db, "config")) if self.db else None
+
         # Changed signature from arg to kwarg so I can splat the hgetall from db in main.py
         command_prefix: str = kwargs.pop("command_prefix", "!")
 
@@ -385,6 +409,14 @@ class Bot(DiscordBot):
             raise LoginFailure("No or improper token passed")
         super().run(token, **kwargs)
 
+    async def close(self):
+        # Stop the map worker processes and the AWBW session along with the bot
+        if self.prefixes:
+            self.prefixes.close()
+        self.map_service.close()
+        await self.awbw.close()
+        await super().close()
+
     async def _run_event(self, coro, event_name: str, *args, **kwargs):
         # Override built-in event handler so we can capture errors raised
         try:
@@ -454,6 +486,10 @@ class SubRedis:
         names = [f"{self.basekey}:{name}" for name in names]
         return self.root.delete(*names)
 
+    def expire(self, name: str, time: int) -> bool:
+        """Set an expire flag on key ``name`` for ``time`` seconds"""
+        return self.root.expire(f"{self.basekey}:{name}", time)
+
     """ ###########
          Iterators
         ########### """
@@ -586,7 +622,129 @@ class SubRedis:
 
     def hdel(self, name: str, *keys):
         """Delete ``keys`` from hash ``name``"""
-        return self.root.hdel(name, *keys)
+        return self.root.hdel(f"{self.basekey}:{name}", *keys)
+
+    """ #########
+         Pub/Sub
+        ######### """
+
+    def publish(self, channel: str, message: str) -> int:
+        """
+        Publish ``message`` on ``channel``
+        Returns the number of subscribers the message was delivered to
+        """
+        return self.root.publish(f"{self.basekey}:{channel}", message)
+
+    def subscribe(self, **handlers: Callable[[Dict[str, Any]], None]) -> PubSub:
+        """
+        Return a ``PubSub`` subscribed to each channel in ``handlers``
+        Each message received is passed to the handler of its channel
+        when the ``PubSub`` is polled, e.g. by ``PubSub.run_in_thread``
+        """
+        pubsub = self.root.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{f"{self.basekey}:{channel}": handler for channel, handler in handlers.items()})
+        return pubsub
+
+
+class PrefixCache:
+    """Prefix settings from db, kept in memory
+
+    `command_prefix` runs on every message, so the settings are read from
+    db once and served from memory after. Changes made through this class
+    update the cache right away and are published so other processes
+    running the bot read the settings from db again on their next message"""
+
+    # Channel the changes are published on, under the config namespace
+    CHANNEL = "prefix:invalidate"
+
+    def __init__(self, config: SubRedis):
+        self.config = config
+
+        # Sent with each change, to skip the ones published by this process
+        self.origin = urandom(8).hex()
+
+        self._config: Dict[str, Any] = dict()
+        self._guilds: Dict[str, str] = dict()
+        self._stale = True
+
+        self._pubsub: Optional[PubSub] = None
+        self._thread = None
+
+    def listen(self) -> None:
+        """Start listening for changes published by other processes
+
+        Messages are received on a thread, which only marks the
+        cache as stale so it is read again on the event loop"""
+        if self._thread is None:
+            self._pubsub = self.config.subscribe(**{self.CHANNEL: self._on_invalidate})
+            self._thread = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def close(self) -> None:
+        """Stop listening for changes"""
+        if self._thread is not None:
+            self._thread.stop()
+            self._pubsub.close()
+            self._thread = None
+            self._pubsub = None
+
+    def _on_invalidate(self, message: Dict[str, Any]) -> None:
+        if message["data"] != self.origin:
+            self._stale = True
+
+    def _load(self) -> None:
+        """Read the settings from db if the cache is stale"""
+        if self._stale:
+            self._stale = False
+            self._config = self.config.hgetall("prefix:config")
+            self._guilds = self.config.hgetall("prefix:guild")
+
+    def _publish(self) -> None:
+        self.config.publish(self.CHANNEL, self.origin)
+
+    @property
+    def default_prefix(self) -> str:
+        """Prefix used everywhere"""
+        self._load()
+        return self._config.get("default_prefix")
+
+    @property
+    def when_mentioned(self) -> bool:
+        """Whether mentioning the bot works as a prefix"""
+        self._load()
+        return bool(self._config.get("when_mentioned"))
+
+    def guild(self, guild_id: int) -> Optional[str]:
+        """Prefix specific to a guild, or `None` if not set"""
+        self._load()
+        return self._guilds.get(str(guild_id))
+
+    def set_default(self, prefix: str) -> None:
+        """Change the default prefix"""
+        self.config.hset("prefix:config", "default_prefix", prefix)
+        self._load()
+        self._config["default_prefix"] = prefix
+        self._publish()
+
+    def set_when_mentioned(self, enabled: bool) -> None:
+        """Change whether mentioning the bot works as a prefix"""
+        self.config.hset("prefix:config", "when_mentioned", str(enabled))
+        self._load()
+        self._config["when_mentioned"] = enabled
+        self._publish()
+
+    def set_guild(self, guild_id: int, prefix: Optional[str]) -> None:
+        """Change the prefix specific to a guild, or unset it if `prefix` is `None`"""
+        if prefix:
+            self.config.hset("prefix:guild", str(guild_id), prefix)
+        else:
+            self.config.hdel("prefix:guild", str(guild_id))
+
+        self._load()
+        if prefix:
+            self._guilds[str(guild_id)] = prefix
+        else:
+            self._guilds.pop(str(guild_id), None)
+        self._publish()
 
 
 class Paginator:
@@ -9,17 +9,29 @@ from .element_id import (
     #
     AWS_TERR,
     AWS_UNIT,
+    AWS_TERR_DECODE,
+    AWS_UNIT_DECODE,
 
     # AWBW IDs for countries, terrains, and units
     AWBW_TERR,
     AWBW_UNIT_CODE,
     AWBW_COUNTRY_CODE,
     AWBW_AWARENESS,
+    AWBW_AWARE_TERR,
+    AWBW_AWARE_OF_BITS,
+    AWBW_AWARE_VARIANTS,
+    AWBW_TERR_DECODE,
+    AWBW_TERR_DECODE_DEFAULT,
 
     #
     main_terr_to_awbw,
     main_terr_to_aws,
-    main_unit_to_aws
+    main_unit_to_aws,
+
+    # Batch versions of the above for whole map layers
+    main_terr_to_awbw_layer,
+    main_terr_to_aws_layer,
+    main_unit_to_aws_layer
 )
 
 from .bitmap import (
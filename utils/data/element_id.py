@@ -1,8 +1,11 @@
 
 # Lib
+from array import array
+from itertools import repeat
+from operator import add, mul
 
 # Site
-from typing import Dict, List, Tuple, Union
+from typing import Dict, Iterable, List, Tuple, Union
 
 # Local
 
@@ -435,6 +438,44 @@ AWS_UNIT: Dict[int, Tuple[int, int]] = {
 }
 
 
+def aws_decode_table(table: Dict[int, Tuple[int, int]]) -> Tuple[Dict[int, bytes], bytes, bytes, bytes]:
+    """Build the tables used to decode whole AWS layers at once with
+    `bytes.translate` instead of one lookup per tile
+
+    Every distinct (Internal ID, Country ID) pair in `table` is given a
+    1-byte code. Code 0 is (0, 0), used for AWS IDs with no match
+
+    :param table: AWS_TERR or AWS_UNIT
+    :return: tuple of
+             dict of translate tables turning the low byte of an AWS ID into
+                its code, keyed by the high byte of the AWS ID
+             translate table of code to low byte of Internal ID
+             translate table of code to high byte of Internal ID
+             translate table of code to Internal Country ID"""
+    pairs = [(0, 0)]
+    word_tables = dict()
+
+    for aws_id, pair in table.items():
+        if pair not in pairs:
+            pairs.append(pair)
+        hi, lo = divmod(aws_id, 256)
+        word_tables.setdefault(hi, bytearray(256))[lo] = pairs.index(pair)
+
+    assert len(pairs) <= 256
+
+    return (
+        {hi: bytes(t) for hi, t in word_tables.items()},
+        bytes(main_id % 256 for main_id, _ in pairs).ljust(256, b"\x00"),
+        bytes(main_id // 256 for main_id, _ in pairs).ljust(256, b"\x00"),
+        bytes(ctry for _, ctry in pairs).ljust(256, b"\x00"),
+    )
+
+
+# Tables for decoding AWS Terrain and Unit IDs in bulk. See `aws_decode_table`
+AWS_TERR_DECODE: Tuple[Dict[int, bytes], bytes, bytes, bytes] = aws_decode_table(AWS_TERR)
+AWS_UNIT_DECODE: Tuple[Dict[int, bytes], bytes, bytes, bytes] = aws_decode_table(AWS_UNIT)
+
+
 """###########################
    # Advance Wars By Web IDs #
    ###########################"""
@@ -871,6 +912,96 @@ def find_overrides():
     pass
 
 
+"""##############################
+   # Inverse ID Lookup Tables #
+   ##############################"""
+
+# Internal Country IDs are packed into the lowest 5 bits of a table index
+# Index for (Internal ID, Country ID) is ID * CTRY_STRIDE + Country ID
+CTRY_STRIDE = 32
+
+
+# Relate Internal Terrain ID (keys) to AWS Terrain ID (values)
+# Some possible terrains do not have an equivalent in
+# AWS Map Editor. Override them to the closest equivalent
+AWS_TERR_OVERRIDE: Dict[int, int] = {
+    14:     350,  # EmptySilo overridden to Silo
+    15:     167,  # Ruin      overridden to BrokenSeam
+    101:    102,  # NHQ       overridden to NCity
+    999:    921,  # NullTile  overridden to MinicannonSouth
+}
+
+
+# Relate Internal Unit ID (keys) to AWS Unit ID (values)
+# I do not currently know a use case for overriding to a different unit
+AWS_UNIT_OVERRIDE: Dict[int, int] = {  # TODO: Consider overriding extra AWBW countries to existing AWS (cart) countries?
+    999999:     999999,  # No overrides
+}
+
+
+# Relate Internal Terrain ID (keys) to AWBW Terrain ID (values)
+AWBW_TERR_OVERRIDE: Dict[int, int] = {
+    999999:     999999,  # No overrides
+}
+
+
+def inverse_table(
+        table: Dict[int, Tuple[int, int]],
+        override: Dict[int, int]
+) -> Dict[Tuple[int, int], List[int]]:
+    """Invert an ID table to relate (Internal ID, Country ID) pairs (keys)
+    to lists of all matching IDs (values), in table order
+
+    IDs in `override` are left out and must be checked first
+
+    :param table: AWS_TERR, AWS_UNIT, or AWBW_TERR
+    :param override: Internal IDs to exclude
+    :return: dict of matching IDs by Internal ID, Country ID pair"""
+    ret = dict()
+    for k, v in table.items():
+        if v[0] not in override.keys():
+            ret.setdefault(v, list()).append(k)
+    return ret
+
+
+def dense_table(
+        inverse: Dict[Tuple[int, int], List[int]],
+        override: Dict[int, int],
+        default: Union[str, int],
+        size: int
+) -> List[Union[str, int]]:
+    """Flatten an inverse ID table into a list indexed by
+    Internal ID * CTRY_STRIDE + Country ID holding the first matching ID,
+    or `default` if there is no match
+
+    :param inverse: table from `inverse_table`
+    :param override: Internal IDs that always translate to the same ID
+    :param default: value for pairs with no match
+    :param size: number of Internal IDs to cover
+    :return: dense list of matching IDs"""
+    ret = [default] * (size * CTRY_STRIDE)
+    for (main_id, ctry), match in inverse.items():
+        if main_id < size:
+            ret[main_id * CTRY_STRIDE + ctry] = match[0]
+    for main_id, match in override.items():
+        if main_id < size:
+            ret[main_id * CTRY_STRIDE:(main_id + 1) * CTRY_STRIDE] = [match] * CTRY_STRIDE
+    return ret
+
+
+# Inverse ID tables used by the conversion functions below
+AWS_TERR_INVERSE = inverse_table(AWS_TERR, AWS_TERR_OVERRIDE)
+AWS_UNIT_INVERSE = inverse_table(AWS_UNIT, AWS_UNIT_OVERRIDE)
+AWBW_TERR_INVERSE = inverse_table(AWBW_TERR, AWBW_TERR_OVERRIDE)
+
+
+# Dense tables for translating whole layers at once. Terrain IDs are under
+# 1024 and Unit IDs under 64
+AWS_TERR_ENCODE: array = array("H", dense_table(AWS_TERR_INVERSE, AWS_TERR_OVERRIDE, 0, 1024))
+AWS_UNIT_ENCODE: array = array("H", dense_table(AWS_UNIT_INVERSE, AWS_UNIT_OVERRIDE, 65535, 64))
+AWBW_TERR_ENCODE: List[Union[str, int]] = dense_table(AWBW_TERR_INVERSE, AWBW_TERR_OVERRIDE, "", 1024)
+
+
 def main_terr_to_aws(terr: int = 1, ctry: int = 0) -> List[int]:
     """Takes internal terrain and country IDs and turns them into
     appropriate terrain IDs for AWS. If no match is found, return
@@ -878,39 +1009,14 @@ def main_terr_to_aws(terr: int = 1, ctry: int = 0) -> List[int]:
 
     :param terr: internal terrain ID
     :param ctry: internal country ID
-    :return: list of matching AWS unit IDs or 65535 (no unit)"""
-
-    # Default value: Plains
-    default_value = [0]
-
-    # Relate Internal Terrain ID (keys) to AWS Terrain ID (values)
-    # Some possible terrains do not have an equivalent in
-    # AWS Map Editor. Override them to the closest equivalent
-    override = {
-        14:     350,  # EmptySilo overridden to Silo
-        15:     167,  # Ruin      overridden to BrokenSeam
-        101:    102,  # NHQ       overridden to NCity
-        999:    921,  # NullTile  overridden to MinicannonSouth
-    }
-
-    # Can have multiple matches
-    match = list()
-
-    # Add all matching keys (AWS Terrain IDs) to list
-    for k, v in AWS_TERR.items():
+    :return: list of matching AWS terrain IDs or 0 (plains)"""
 
-        # Apply overrides if present
-        if terr in override.keys():
-            match.append(override[terr])
-            break
-        if (terr, ctry) == v:
-            match.append(k)
+    # Apply overrides if present
+    if terr in AWS_TERR_OVERRIDE.keys():
+        return [AWS_TERR_OVERRIDE[terr]]
 
-    # No match: empty list. Send default
-    if match:
-        return match
-    else:
-        return default_value
+    # Can have multiple matches. No match: Send default (Plains)
+    return list(AWS_TERR_INVERSE.get((terr, ctry), [0]))
 
 
 def main_unit_to_aws(unit: int = 0, ctry: int = 1) -> List[int]:
@@ -922,33 +1028,12 @@ def main_unit_to_aws(unit: int = 0, ctry: int = 1) -> List[int]:
     :param ctry: internal country ID
     :return: list of matching AWS unit IDs or 65535 (no unit)"""
 
-    # Default value: No Unit
-    default_value = [65535]
+    # Apply overrides if present
+    if unit in AWS_UNIT_OVERRIDE.keys():
+        return [AWS_UNIT_OVERRIDE[unit]]
 
-    # Relate Internal Unit ID (keys) to AWS Unit ID (values)
-    # I do not currently know a use case for overriding to a different unit
-    override = {  # TODO: Consider overriding extra AWBW countries to existing AWS (cart) countries?
-        999999:     999999,  # No overrides
-    }
-
-    # Can have multiple matches
-    match = list()
-
-    # Add all matching keys (AWS Unit IDs) to list
-    for k, v in AWS_UNIT.items():
-
-        # Apply overrides if present
-        if unit in override.keys():
-            match.append(override[unit])
-            break
-        if (unit, ctry) == v:
-            match.append(k)
-
-    # No match: empty list. Send default
-    if match:
-        return match
-    else:
-        return default_value
+    # Can have multiple matches. No match: Send default (No Unit)
+    return list(AWS_UNIT_INVERSE.get((unit, ctry), [65535]))
 
 
 def main_terr_to_awbw(terr: int = 1, ctry: int = 0) -> List[Union[str, int]]:
@@ -962,31 +1047,89 @@ def main_terr_to_awbw(terr: int = 1, ctry: int = 0) -> List[Union[str, int]]:
     :param ctry: internal country ID
     :return: list of matching AWBW terrain IDs or empty string"""
 
-    # Default value: Blank/Teleport Tile
-    default_value = [""]
+    # Apply overrides if present
+    if terr in AWBW_TERR_OVERRIDE.keys():
+        return [AWBW_TERR_OVERRIDE[terr]]
 
-    # Relate Internal Terrain ID (keys) to AWS Terrain ID (values)
-    # Some possible terrains do not have an equivalent in
-    # AWS Map Editor. Override them to the closest equivalent
-    override = {
-        999999:     999999,  # No overrides
-    }
+    # Can have multiple matches. No match: Send default (Blank/Teleport Tile)
+    return list(AWBW_TERR_INVERSE.get((terr, ctry), [""]))
+
+
+# Internal Terrain IDs with AWBW variations based on their surroundings
+# Position in this list is the bit used for them in AWBW_AWARE_OF_BITS
+AWBW_AWARE_TERR: List[int] = list(AWBW_AWARENESS["aware_of"].keys())
+
+
+# For each Internal Terrain ID (index), bitfield of the terrains in
+# AWBW_AWARE_TERR that are aware of it. Covers all IDs under 1024
+AWBW_AWARE_OF_BITS: bytes = bytes(
+    sum(1 << bit for bit, terr in enumerate(AWBW_AWARE_TERR) if i in AWBW_AWARENESS["aware_of"][terr])
+    for i in range(1024)
+)
+
+
+# Relate aware Internal Terrain IDs (keys) to the AWBW Terrain ID used
+# for each of the 16 possible awareness masks (values, by mask)
+AWBW_AWARE_VARIANTS: Dict[int, List[int]] = {
+    terr: [main_terr_to_awbw(terr, 0)[AWBW_AWARENESS[terr][mask]] for mask in range(16)]
+    for terr in AWBW_AWARE_TERR
+}
+
+
+def awbw_decode_table() -> Dict[int, Tuple[int, int, int]]:
+    """Relate every AWBW Terrain ID to the Internal Terrain ID, Country ID,
+    and awareness override it loads as
+
+    The awareness override of an aware terrain variation is the first
+    awareness mask that gives its offset from the first AWBW ID of the
+    terrain. Other terrain has no awareness override (0)
+
+    :return: dict of (Internal Terrain ID, Country ID, override) by AWBW Terrain ID"""
+    ret = dict()
+    for awbw_id, (terr, ctry) in AWBW_TERR.items():
+        override = 0
+        if terr in AWBW_AWARENESS["aware_of"].keys():
+            offset = awbw_id - main_terr_to_awbw(terr, ctry)[0]
+            override = list(AWBW_AWARENESS[terr].values()).index(offset)
+        ret[awbw_id] = (terr, ctry, override)
+    return ret
+
+
+# AWBW Terrain ID (keys) to Internal Terrain ID, Country ID, awareness override (values)
+# AWBW Terrain IDs with no match load as Plains
+AWBW_TERR_DECODE: Dict[int, Tuple[int, int, int]] = awbw_decode_table()
+AWBW_TERR_DECODE_DEFAULT: Tuple[int, int, int] = (1, 0, 0)
+
+
+def _table_keys(main_ids: Iterable[int], ctrys: Iterable[int]) -> Iterable[int]:
+    """Dense table indices for parallel layers of Internal IDs and Country IDs"""
+    return map(add, map(mul, main_ids, repeat(CTRY_STRIDE)), ctrys)
+
+
+def main_terr_to_aws_layer(terrs: Iterable[int], ctrys: Iterable[int]) -> array:
+    """Batch version of `main_terr_to_aws` for a whole layer of a map
+
+    :param terrs: internal terrain IDs
+    :param ctrys: matching internal country IDs
+    :return: `array` of the first matching AWS terrain ID for each tile"""
+    return array("H", map(AWS_TERR_ENCODE.__getitem__, _table_keys(terrs, ctrys)))
+
+
+def main_unit_to_aws_layer(units: Iterable[int], ctrys: Iterable[int]) -> array:
+    """Batch version of `main_unit_to_aws` for a whole layer of a map
+
+    :param units: internal unit IDs
+    :param ctrys: matching internal country IDs
+    :return: `array` of the first matching AWS unit ID for each tile"""
+    return array("H", map(AWS_UNIT_ENCODE.__getitem__, _table_keys(units, ctrys)))
 
-    # Can have multiple matches
-    match = list()
 
-    # Add all matching keys (AWBW Terrain IDs) to list
-    for k, v in AWBW_TERR.items():
+def main_terr_to_awbw_layer(terrs: Iterable[int], ctrys: Iterable[int]) -> List[Union[str, int]]:
+    """Batch version of `main_terr_to_awbw` for a whole layer of a map
 
-        # Apply overrides if present
-        if terr in override.keys():
-            match.append(override[terr])
-            break
-        if (terr, ctry) == v:
-            match.append(k)
+    Variations of aware terrain are not resolved; the first AWBW ID is used
 
-    # No match: emtpy list. Send default
-    if match:
-        return match
-    else:
-        return default_value
+    :param terrs: internal terrain IDs
+    :param ctrys: matching internal country IDs
+    :return: list of the first matching AWBW terrain ID for each tile"""
+    return list(map(AWBW_TERR_ENCODE.__getitem__, _table_keys(terrs, ctrys)))
@@ -31,3 +31,13 @@ class UnimplementedError(CommandError):
 class FileSaveFailureError(CommandError):
     """Exception raised when a failure prevents an
     attachment from being saved"""
+
+
+class MapServiceBusyError(CommandError):
+    """Exception raised when the `MapService` worker
+    pool already has as many jobs as it will accept"""
+
+
+class MapServiceTimeoutError(CommandError):
+    """Exception raised when a `MapService` job takes
+    longer than its timeout to finish"""
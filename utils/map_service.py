@@ -0,0 +1,196 @@
+"""Pool of worker processes for the CPU heavy work on maps
+
+Parsing, rendering minimaps, and exporting large maps can take long enough
+to hold up the bot's event loop, and with it the gateway heartbeat and
+every other cog. `MapService` runs that work in separate processes instead
+and exposes it as coroutines.
+"""
+
+# Lib
+from asyncio import TimeoutError, get_event_loop, run, shield, wait_for
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from multiprocessing import get_all_start_methods, get_context
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Local
+from utils.awmap import AWMap, AWMinimap, MinimapFrames, MINIMAP_CACHE
+from utils.errors import MapServiceBusyError, MapServiceTimeoutError
+from utils.timers import STAGE_TIMES
+
+
+# Workers are started fresh instead of forked from the bot, which by the
+# time the first job comes in has threads of its own running. Forked from a
+# forkserver where there is one, e.g. Linux. Either way, the workers import
+# the main module again, so it must be safe to import
+MP_CONTEXT = get_context("forkserver" if "forkserver" in get_all_start_methods() else "spawn")
+
+
+""" ##############
+     Worker Jobs
+    ############## """
+
+# Jobs run in the worker processes. They must be module level functions
+# so they can be pickled, and take and return only picklable objects
+
+
+def _load_aws(data: bytes) -> AWMap:
+    return AWMap().from_aws(data)
+
+
+def _load_csv(data: str, title: str) -> AWMap:
+    # No network access is needed for CSV data, so the coroutine finishes in one go
+    return run(AWMap().from_awbw(data=data, title=title))
+
+
+def _render_minimap(awmap: AWMap) -> Tuple[Tuple[bytes, Dict[str, float]], Dict[str, Any]]:
+    minimap = AWMinimap(awmap)
+    return (minimap.map.getvalue(), minimap.timings), awmap.exports
+
+
+def _encode_minimap(frames: MinimapFrames) -> Tuple[bytes, Dict[str, float]]:
+    minimap = AWMinimap(frames)
+    return minimap.map.getvalue(), minimap.timings
+
+
+def _export_aws(awmap: AWMap) -> Tuple[bytes, Dict[str, Any]]:
+    return bytes(awmap.to_aws), awmap.exports
+
+
+def _export_awbw(awmap: AWMap) -> Tuple[str, Dict[str, Any]]:
+    return awmap.to_awbw, awmap.exports
+
+
+class MapService:
+    """Runs map parsing, rendering, and exports in a pool of worker processes
+
+    At most `max_jobs` jobs are accepted at a time. Jobs are given `timeout`
+    seconds to finish. A job that times out still holds its place until its
+    worker is done with it, so a flood of slow jobs can't pile up behind
+    the limit. Exports of maps with up to date cached exports are cheap and
+    are done in place instead"""
+
+    def __init__(self, workers: Optional[int] = None, max_jobs: int = 8, timeout: float = 30) -> None:
+        """
+        :param workers: Number of worker processes. Defaults to number of CPUs
+        :param max_jobs: Number of jobs accepted at once before raising
+                         `MapServiceBusyError`
+        :param timeout: Seconds to wait for a job before raising
+                        `MapServiceTimeoutError`
+        """
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+
+        # Jobs submitted and not yet finished by a worker
+        self.jobs: int = 0
+
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=MP_CONTEXT)
+
+    async def run(self, func: Callable, *args: Any, timeout: Optional[float] = None) -> Any:
+        """Run a job in a worker process
+
+        :param func: Module level function to run
+        :param args: Picklable arguments to call `func` with
+        :param timeout: Seconds to wait instead of `self.timeout`
+
+        :raises MapServiceBusyError: if `max_jobs` jobs are already running
+        :raises MapServiceTimeoutError: if the job does not finish in time
+
+        :return: Return value of `func`"""
+
+        if self.jobs >= self.max_jobs:
+            raise MapServiceBusyError
+
+        try:
+            future = get_event_loop().run_in_executor(self.executor, func, *args)
+        except BrokenProcessPool:
+            # A worker died, e.g. killed for running out of memory. The pool
+            # can't be used again, so replace it for the jobs that follow
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=MP_CONTEXT)
+            future = get_event_loop().run_in_executor(self.executor, func, *args)
+
+        self.jobs += 1
+        future.add_done_callback(self._job_done)
+
+        try:
+            return await wait_for(shield(future), timeout or self.timeout)
+        except TimeoutError:
+            raise MapServiceTimeoutError
+
+    def _job_done(self, _: Future) -> None:
+        self.jobs -= 1
+
+    def close(self) -> None:
+        """Shut down the worker processes without waiting for running jobs"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    """ #########
+         Parsing
+        ######### """
+
+    async def load_aws(self, data: bytes) -> AWMap:
+        """`AWMap` from the bytes of an AWS map file"""
+        return await self.run(_load_aws, bytes(data))
+
+    async def load_csv(self, data: str, title: str = "") -> AWMap:
+        """`AWMap` from AWBW CSV text
+
+        :raises AssertionError: if rows have differing numbers of columns"""
+        return await self.run(_load_csv, data, title)
+
+    """ ###########
+         Rendering
+        ########### """
+
+    async def minimap(self, awmap: AWMap) -> BytesIO:
+        """Minimap image of a map, from `MINIMAP_CACHE` if it has been rendered before
+
+        If the map's minimap frames are cached, only the tiles edited since
+        are repainted in place and the worker just encodes them. Time spent
+        painting and encoding is recorded in `STAGE_TIMES`"""
+        digest = awmap.digest
+
+        image = MINIMAP_CACHE.get(digest)
+        if image is None:
+            if "minimap" in awmap.exports:
+                with STAGE_TIMES.time("paint"):
+                    frames = awmap.minimap_frames
+                image, timings = await self.run(_encode_minimap, frames)
+            else:
+                image, timings = await self._export(_render_minimap, awmap)
+            for stage, seconds in timings.items():
+                STAGE_TIMES.record(stage, seconds)
+            MINIMAP_CACHE.put(digest, image)
+
+        return BytesIO(image)
+
+    """ #########
+         Exports
+        ######### """
+
+    async def to_aws(self, awmap: AWMap) -> bytes:
+        """Bytes of an AWS map file of a map"""
+        if "aws" in awmap.exports:
+            return bytes(awmap.to_aws)
+        return await self._export(_export_aws, awmap)
+
+    async def to_awbw(self, awmap: AWMap) -> str:
+        """AWBW CSV text of a map"""
+        if "awbw" in awmap.exports:
+            return awmap.to_awbw
+        return await self._export(_export_awbw, awmap)
+
+    async def _export(self, func: Callable, awmap: AWMap) -> Any:
+        """Export or render a map in a worker and keep the cached export it
+        generated so the next export of the map can be patched in place"""
+        version = awmap.version
+
+        data, exports = await self.run(func, awmap)
+
+        # The worker exported the map as it was when the job was submitted
+        if awmap.version == version:
+            awmap.adopt_exports(exports)
+
+        return data
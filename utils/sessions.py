@@ -0,0 +1,327 @@
+"""Maps loaded by each user, expiring after they go unused for a while"""
+
+# Lib
+from array import array
+from asyncio import Task, ensure_future, sleep
+from base64 import b85decode, b85encode
+from collections import OrderedDict
+from datetime import datetime
+from heapq import heapify, heappop, heappush
+from itertools import count
+from os import urandom
+from sys import byteorder
+from time import monotonic
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from zlib import compress, decompress, error as ZlibError
+
+# Local
+from utils.awmap import AWMap
+
+
+def dump_map(awmap: AWMap) -> Dict[str, str]:
+    """Serialize a map for Redis as a hash of strings
+
+    The layers are stored as they are in memory, one after the other,
+    compressed and Base85 encoded since responses from the db are decoded
+    as text. AWS files can't be used as they don't keep owned properties
+    or awareness overrides as loaded from AWBW
+
+    :param awmap: `AWMap` to serialize
+    :return: dict of field: value"""
+    terr_layer = array("H", awmap.terr_layer)
+    if byteorder == "big":
+        terr_layer.byteswap()
+
+    layers = b"".join((
+        terr_layer.tobytes(),
+        awmap.t_ctry_layer.tobytes(),
+        awmap.unit_layer.tobytes(),
+        awmap.u_ctry_layer.tobytes(),
+        awmap.awareness_layer.tobytes()
+    ))
+
+    return {
+        "layers": b85encode(compress(layers)).decode("ascii"),
+        "size_w": awmap.size_w,
+        "size_h": awmap.size_h,
+        "style": awmap.style,
+        "title": awmap.title,
+        "author": awmap.author,
+        "desc": awmap.desc,
+        "awbw_id": awmap.awbw_id,
+        "override_awareness": int(awmap.override_awareness),
+    }
+
+
+def load_map(fields: Dict[str, str]) -> AWMap:
+    """Rebuild a map serialized by `dump_map`
+
+    :param fields: dict of field: value
+    :return: `AWMap`
+    :raises ValueError: if the fields are not a serialized map"""
+    awmap = AWMap()
+    try:
+        awmap.size_w, awmap.size_h, awmap.style = (int(fields[k]) for k in ("size_w", "size_h", "style"))
+        layers = decompress(b85decode(fields["layers"]))
+    except (KeyError, ZlibError) as e:
+        raise ValueError("Not a serialized map") from e
+
+    size = awmap.map_size
+    if len(layers) != size * 6:
+        raise ValueError("Not a serialized map")
+
+    awmap.terr_layer = array("H", layers[:size * 2])
+    if byteorder == "big":
+        awmap.terr_layer.byteswap()
+    awmap.t_ctry_layer, awmap.unit_layer, awmap.u_ctry_layer, awmap.awareness_layer = (
+        array("B", layers[size * n:size * (n + 1)]) for n in range(2, 6)
+    )
+
+    # The bot's `StrictRedis` turns "True" and "False" into bools, so turn
+    # them back, e.g. for a map titled "True"
+    awmap.title = str(fields.get("title", ""))
+    awmap.author = str(fields.get("author", ""))
+    awmap.desc = str(fields.get("desc", ""))
+    awmap.awbw_id = str(fields.get("awbw_id", ""))
+    awmap.override_awareness = fields.get("override_awareness") != "0"
+
+    awmap._clear_caches()
+    awmap._build_indexes()
+    return awmap
+
+
+class Session:
+    """A map loaded by a user"""
+
+    __slots__ = ("user_id", "awmap", "token", "loaded", "expires", "nbytes")
+
+    def __init__(self, user_id: int, awmap: AWMap, token: str, loaded: datetime, expires: float) -> None:
+        self.user_id = user_id
+        self.awmap = awmap
+
+        # Changes each time the map is stored, to tell if the copy in the
+        # db was replaced by another process
+        self.token = token
+
+        # When the map was loaded, for display
+        self.loaded = loaded
+
+        # `monotonic` time the session expires at unless it is used again
+        self.expires = expires
+
+        # `AWMap.nbytes` as of the last time the session was used
+        self.nbytes: int = awmap.nbytes
+
+
+class SessionStore:
+    """Maps loaded by each user, by user ID
+
+    A session expires `ttl` seconds after its map was last loaded or
+    looked up. Expiry is handled by a single task sleeping until the
+    earliest deadline in a heap, so nothing waits on each session.
+
+    Sessions are also kept in least recently used order. When there are
+    more than `max_sessions` of them or their maps add up to more than
+    `max_bytes`, the least recently used are dropped right away.
+
+    If a db is given, sessions are written through to it and expire there
+    after `ttl` seconds instead. Maps are only kept in memory until they go
+    unused for `idle` seconds, and are read back from the db the next time
+    they are looked up, e.g. after the bot restarts"""
+
+    def __init__(
+            self,
+            ttl: int = 300,
+            idle: Optional[int] = None,
+            max_sessions: int = 500,
+            max_bytes: int = 128 * 1024 * 1024,
+            db: Any = None
+    ) -> None:
+        """
+        :param ttl: Seconds a session is kept after it was last used
+        :param idle: Seconds a map is kept in memory after it was last
+                     used if a db is given. Defaults to `ttl`
+        :param max_sessions: Most maps kept in memory
+        :param max_bytes: Most `AWMap.nbytes` kept in memory
+        :param db: Optional `SubRedis` to keep the sessions in
+        """
+        self.ttl = ttl
+        self.idle = ttl if idle is None or db is None else idle
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.db = db
+
+        # Total `Session.nbytes` of the sessions held
+        self.nbytes: int = 0
+
+        self._sessions: OrderedDict[int, Session] = OrderedDict()
+
+        # (deadline, tiebreaker, session). Looking a session up doesn't push
+        # an entry. Its entry is pushed again with the new deadline when the
+        # old one comes up. Storing a map does push one, leaving the entry of
+        # the session it replaced behind. Left behind entries are skipped when
+        # they come up, and cleared out once they outnumber the live ones
+        self._deadlines: List[Tuple[float, int, Session]] = list()
+        self._seq = count()
+
+        self._expiry: Optional[Task] = None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, user_id: int) -> bool:
+        if user_id in self._sessions:
+            return True
+        return self.db is not None and bool(self.db.exists(str(user_id)))
+
+    def items(self) -> Iterator[Tuple[int, Session]]:
+        """(user ID, `Session`) of every session in memory, least recently used first"""
+        return iter(list(self._sessions.items()))
+
+    def put(self, user_id: int, awmap: AWMap) -> None:
+        """Store the map loaded by a user, replacing any map they had loaded
+
+        :param user_id: ID of the user
+        :param awmap: `AWMap` they loaded"""
+        token = urandom(8).hex()
+        loaded = datetime.utcnow()
+
+        if self.db is not None:
+            key = str(user_id)
+            self.db.delete(key)
+            self.db.hmset(key, {**dump_map(awmap), "token": token, "loaded": loaded.isoformat()})
+            self.db.expire(key, self.ttl)
+
+        self._hold(Session(user_id, awmap, token, loaded, monotonic() + self.idle))
+
+    def get(self, user_id: int) -> Optional[AWMap]:
+        """Map loaded by a user, resetting the time until it expires
+
+        Read from the db if it is not in memory or it was stored again
+        by another process
+
+        :param user_id: ID of the user
+        :return: `AWMap` or `None` if they have no map loaded"""
+        session = self._sessions.get(user_id)
+
+        if self.db is not None:
+            key = str(user_id)
+            token = self.db.hget(key, "token")
+
+            # Expired, or replaced by another process
+            if session is not None and token != session.token:
+                self._drop(user_id)
+                session = None
+
+            if session is None and token is not None:
+                session = self._hydrate(user_id)
+
+            if session is None:
+                return None
+
+            self.db.expire(key, self.ttl)
+
+        elif session is None:
+            return None
+
+        session.expires = monotonic() + self.idle
+        self._sessions.move_to_end(user_id)
+
+        # The map may have grown since, e.g. by caching its exports
+        nbytes = session.awmap.nbytes
+        self.nbytes += nbytes - session.nbytes
+        session.nbytes = nbytes
+        self._evict(keep=user_id)
+
+        return session.awmap
+
+    def clear(self) -> None:
+        """Drop every session from memory and stop the expiry task.
+        Sessions in the db are kept"""
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+
+        self._sessions.clear()
+        self._deadlines.clear()
+        self.nbytes = 0
+
+    def _hold(self, session: Session) -> None:
+        """Keep a session in memory, replacing any held for the same user"""
+        self._drop(session.user_id)
+
+        self._sessions[session.user_id] = session
+        self.nbytes += session.nbytes
+        heappush(self._deadlines, (session.expires, next(self._seq), session))
+
+        self._evict(keep=session.user_id)
+
+        if len(self._deadlines) > 2 * len(self._sessions) + 16:
+            self._deadlines = [entry for entry in self._deadlines if self._is_held(entry[2])]
+            heapify(self._deadlines)
+
+        if self._expiry is None or self._expiry.done():
+            self._expiry = ensure_future(self._expire())
+
+    def _hydrate(self, user_id: int) -> Optional[Session]:
+        """Read a session from the db into memory
+
+        :param user_id: ID of the user
+        :return: `Session` or `None` if the db has none for the user"""
+        key = str(user_id)
+        fields = self.db.hgetall(key)
+        if not fields:
+            return None
+
+        try:
+            awmap = load_map(fields)
+            loaded = datetime.fromisoformat(fields["loaded"])
+            token = fields["token"]
+        except (KeyError, ValueError):
+            self.db.delete(key)
+            return None
+
+        session = Session(user_id, awmap, token, loaded, monotonic() + self.idle)
+        self._hold(session)
+        return session
+
+    def _is_held(self, session: Session) -> bool:
+        """Whether `session` is the one held in memory for its user"""
+        return self._sessions.get(session.user_id) is session
+
+    def _drop(self, user_id: int) -> None:
+        """Drop a session from memory. Its heap entry is skipped when it comes up"""
+        session = self._sessions.pop(user_id, None)
+        if session is not None:
+            self.nbytes -= session.nbytes
+
+    def _evict(self, keep: int) -> None:
+        """Drop least recently used sessions until back within the limits
+
+        :param keep: ID of the user whose session was just used, which is
+                     kept even if its map alone is over `max_bytes`"""
+        while len(self._sessions) > self.max_sessions or self.nbytes > self.max_bytes:
+            user_id = next(iter(self._sessions))
+            if user_id == keep:
+                break
+            self._drop(user_id)
+
+    async def _expire(self) -> None:
+        """Drop sessions as they expire. Ends once there are none left"""
+        while self._deadlines:
+            deadline, _, session = self._deadlines[0]
+            now = monotonic()
+            if deadline > now:
+                await sleep(deadline - now)
+                continue
+
+            heappop(self._deadlines)
+
+            # Replaced or dropped since the entry was pushed
+            if not self._is_held(session):
+                continue
+
+            if session.expires > now:
+                heappush(self._deadlines, (session.expires, next(self._seq), session))
+            else:
+                self._drop(session.user_id)
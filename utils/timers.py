@@ -0,0 +1,60 @@
+"""Rolling latency statistics for the stages of the map commands"""
+
+# Lib
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Deque, Dict, Generator, Tuple
+
+
+class StageTimes:
+    """Latencies of the latest runs of each stage, by stage name
+
+    Only the last `window` samples of each stage are kept, so the
+    percentiles follow how the bot is doing now rather than since it
+    started"""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = dict()
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Add a sample to a stage
+
+        :param stage: name of the stage, e.g. "parse"
+        :param seconds: time the stage took"""
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples[stage] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Generator[None, None, None]:
+        """Record the time the `with` block takes as a sample of a stage.
+        Blocks that raise are not recorded
+
+        :param stage: name of the stage"""
+        begin = perf_counter()
+        yield
+        self.record(stage, perf_counter() - begin)
+
+    def summary(self) -> Dict[str, Tuple[int, float, float, float]]:
+        """Percentiles of each stage's samples, in the order stages were first recorded
+
+        :return: dict of stage: (samples, p50, p95, p99) in seconds"""
+        summary = dict()
+        for stage, samples in self._samples.items():
+            ordered = sorted(samples)
+            count = len(ordered)
+
+            # Nearest rank: the smallest sample at least `p` percent of samples are at or below
+            p50, p95, p99 = (ordered[max(0, -(-count * p // 100) - 1)] for p in (50, 95, 99))
+            summary[stage] = (count, p50, p95, p99)
+        return summary
+
+    def clear(self) -> None:
+        """Drop every sample"""
+        self._samples.clear()
+
+
+STAGE_TIMES = StageTimes()
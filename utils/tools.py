@@ -3,10 +3,11 @@
 
 # Lib
 import sys
+from array import array
 from contextlib import contextmanager
 from io import StringIO, BytesIO
 from time import localtime, strftime
-from typing import Iterable, Literal, Tuple, Union
+from typing import Dict, Iterable, Literal, Tuple, Union
 
 # Site
 from aiohttp.client import ClientSession
@@ -107,6 +108,40 @@ def bytespop(
         return ret, b
 
 
+def translate_words(data: Union[bytes, bytearray], tables: Dict[int, bytes]) -> bytes:
+    """Like `bytes.translate`, but for a sequence of 2-byte little endian
+    words. Each word is translated to a single byte
+
+    The low byte of each word is translated with the table for its high
+    byte. Words with a high byte missing from `tables` translate to 0
+
+    :param data: bytes of 2-byte little endian words
+    :param tables: 256-byte translate tables keyed by high byte
+    :return: bytes with one translated byte per word"""
+
+    lo, hi = bytes(data[0::2]), bytes(data[1::2])
+
+    # Translate all of the low bytes with each table in use, then keep only
+    # the bytes whose high byte matches the table by masking with big ints
+    ret = 0
+    for h in set(hi):
+        if h in tables:
+            mask = hi.translate(bytes(0xFF if i == h else 0 for i in range(256)))
+            ret |= int.from_bytes(lo.translate(tables[h]), "little") & int.from_bytes(mask, "little")
+
+    return ret.to_bytes(len(lo), "little")
+
+
+def join_words(lo: bytes, hi: bytes) -> array:
+    """Combine planes of low and high bytes into an `array` of 2-byte ints"""
+    words = bytearray(len(lo) * 2)
+    words[0::2], words[1::2] = lo, hi
+    ret = array("H", words)
+    if sys.byteorder == "big":
+        ret.byteswap()
+    return ret
+
+
 def bool_transform(arg):
     if isinstance(arg, str):
         return bool_str(arg)